@@ -1,67 +1,127 @@
 """JWT authentication and user validation."""
 
-from typing import Optional
-from fastapi import Header, HTTPException
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import jwt
+from fastapi import Depends, Header, HTTPException
+from app.core.config import get_settings
 from app.core.supabase import get_supabase_client
 from app.core.logger import logger
 
+# Validated tokens are cached by SHA-256 digest so repeat requests within the
+# token's lifetime skip the Supabase round-trip (raw tokens are never stored)
+TOKEN_CACHE_MAXSIZE = 10_000
+TOKEN_CACHE_TTL = 300  # Upper bound in seconds, tightened by the JWT exp claim
+
+_token_cache: Dict[bytes, Tuple[str, float]] = {}
+_token_cache_lock = threading.Lock()
+
+_BEARER_PREFIX = "bearer "
+
+# Supabase access tokens are JWTs well over this length; anything shorter, or
+# without the three dot-separated segments, is rejected without validation
+_MIN_TOKEN_LENGTH = 40
+
+
+def token_digest(token: str) -> bytes:
+    """Return the SHA-256 digest used to key caches by a user's JWT."""
+    return hashlib.sha256(token.encode()).digest()
 
-def get_user_id(authorization: Optional[str] = Header(None)) -> str:
-    """
-    Extract and validate JWT from Authorization header.
 
-    Returns the Supabase user ID (UUID) from the validated JWT.
+def _get_cached_user_id(key: bytes) -> Optional[str]:
+    """Return the cached user ID for a token digest, dropping expired entries."""
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del _token_cache[key]
+            return None
+        return user_id
+
+
+def _cache_user_id(key: bytes, user_id: str, exp: Optional[float]) -> None:
+    """Cache a validated user ID until the token expires or the TTL elapses."""
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    if exp is not None:
+        expires_at = min(expires_at, exp)
+
+    with _token_cache_lock:
+        if key not in _token_cache and len(_token_cache) >= TOKEN_CACHE_MAXSIZE:
+            # Evict the oldest entry (dicts preserve insertion order)
+            del _token_cache[next(iter(_token_cache))]
+        _token_cache[key] = (user_id, expires_at)
+
+
+def _get_token_exp(token: str) -> Optional[float]:
+    """Read the exp claim of a token whose signature was verified elsewhere."""
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return None
+    exp = claims.get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def _verify_token_locally(token: str, secret: str) -> Optional[Tuple[str, float]]:
+    """
+    Verify a Supabase JWT with the project's JWT secret.
 
     Args:
-        authorization: Authorization header value (Bearer <token>)
+        token: JWT access token
+        secret: Supabase project JWT secret (HS256)
 
     Returns:
-        User ID (UUID string)
+        Tuple of (user_id, exp), or None if the token could not be verified
+    """
+    try:
+        claims = jwt.decode(
+            token,
+            secret,
+            algorithms=["HS256"],
+            audience="authenticated",
+            options={"require": ["sub", "exp"]},
+        )
+    except jwt.InvalidTokenError as e:
+        logger.debug("Local JWT verification failed, falling back to Supabase: %s", e)
+        return None
+    return str(claims["sub"]), float(claims["exp"])
+
+
+def _extract_bearer(authorization: Optional[str]) -> str:
+    """
+    Extract the token from a Bearer Authorization header.
+
+    Only the 7-character scheme prefix is case-folded, so long tokens are
+    never copied just to validate the header format.
 
     Raises:
-        HTTPException: 401 if token is missing or invalid
+        HTTPException: 401 if the header is missing, malformed or empty
     """
     if not authorization:
         logger.warning("Authentication failed: Missing authorization header")
-        raise HTTPException(
-            status_code=401, detail="Missing authorization header"
-        )
-    
-    if not authorization.lower().startswith("bearer "):
-        logger.warning("Authentication failed: Invalid authorization header format (expected 'Bearer <token>')")
-        raise HTTPException(
-            status_code=401, detail="Invalid authorization header format. Expected: Bearer <token>"
-        )
+        raise HTTPException(status_code=401, detail="Missing authorization header")
 
-    token = authorization.split(" ", 1)[1]
-    
-    if not token or not token.strip():
-        logger.warning("Authentication failed: Empty token")
+    if authorization[:7].lower() != _BEARER_PREFIX:
+        logger.warning(
+            "Authentication failed: Invalid authorization header format (expected 'Bearer <token>')"
+        )
         raise HTTPException(
-            status_code=401, detail="Empty token"
+            status_code=401,
+            detail="Invalid authorization header format. Expected: Bearer <token>",
         )
 
-    logger.debug("Validating JWT token with Supabase")
-
-    try:
-        # Use the shared Supabase client
-        # getUser(token) validates the token server-side and returns user info
-        client = get_supabase_client()
-        response = client.auth.get_user(token)
-        
-        if not response.user:
-            logger.warning("Authentication failed: Invalid token - no user found")
-            raise HTTPException(status_code=401, detail="Invalid token")
+    token = authorization[7:]
 
-        user_id = response.user.id
-        logger.debug(f"Authentication successful - user_id: {user_id}")
-        return user_id
+    if not token.strip():
+        logger.warning("Authentication failed: Empty token")
+        raise HTTPException(status_code=401, detail="Empty token")
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Token validation failed: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+    return token
 
 
 def get_user_token(authorization: Optional[str] = Header(None)) -> str:
@@ -77,22 +137,63 @@ def get_user_token(authorization: Optional[str] = Header(None)) -> str:
     Raises:
         HTTPException: 401 if token is missing or invalid
     """
-    if not authorization:
-        raise HTTPException(
-            status_code=401, detail="Missing authorization header"
-        )
-    
-    if not authorization.lower().startswith("bearer "):
-        raise HTTPException(
-            status_code=401, detail="Invalid authorization header format. Expected: Bearer <token>"
-        )
+    return _extract_bearer(authorization)
 
-    token = authorization.split(" ", 1)[1]
-    
-    if not token or not token.strip():
-        raise HTTPException(
-            status_code=401, detail="Empty token"
-        )
 
-    return token
+def get_user_id(token: str = Depends(get_user_token)) -> str:
+    """
+    Validate the bearer JWT and return the Supabase user ID (UUID).
+
+    Depends on get_user_token, so FastAPI parses the Authorization header
+    once per request even when a route also injects the raw token.
+
+    Args:
+        token: JWT token extracted from the Authorization header
+
+    Returns:
+        User ID (UUID string)
+
+    Raises:
+        HTTPException: 401 if token is invalid
+    """
+    if len(token) < _MIN_TOKEN_LENGTH or token.count(".") != 2:
+        logger.warning("Authentication failed: Malformed token")
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    cache_key = token_digest(token)
+    cached_user_id = _get_cached_user_id(cache_key)
+    if cached_user_id is not None:
+        logger.debug("Authentication cache hit - user_id: %s", cached_user_id)
+        return cached_user_id
+
+    jwt_secret = get_settings().supabase_jwt_secret
+    if jwt_secret:
+        verified = _verify_token_locally(token, jwt_secret)
+        if verified is not None:
+            user_id, exp = verified
+            _cache_user_id(cache_key, user_id, exp)
+            logger.debug("Authentication successful (local) - user_id: %s", user_id)
+            return user_id
+
+    logger.debug("Validating JWT token with Supabase")
+
+    try:
+        # Use the shared Supabase client
+        # getUser(token) validates the token server-side and returns user info
+        client = get_supabase_client()
+        response = client.auth.get_user(token)
 
+        if not response.user:
+            logger.warning("Authentication failed: Invalid token - no user found")
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        user_id = response.user.id
+        _cache_user_id(cache_key, user_id, _get_token_exp(token))
+        logger.debug("Authentication successful - user_id: %s", user_id)
+        return user_id
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Token validation failed: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid token")
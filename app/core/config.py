@@ -1,21 +1,38 @@
 """Application configuration and environment variables."""
 
 import os
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
 
-load_dotenv()
+# Project-root .env; an explicit path skips find_dotenv's directory search
+ENV_FILE = Path(__file__).resolve().parents[2] / ".env"
+
+load_dotenv(ENV_FILE)
 
 
 class Settings:
     """Application settings loaded from environment variables."""
 
+    __slots__ = (
+        "supabase_url",
+        "supabase_service_role_key",
+        "supabase_anon_key",
+        "supabase_jwt_secret",
+        "bucket",
+        "port",
+        "log_level",
+        "log_file",
+    )
+
     def __init__(self) -> None:
         self.supabase_url: str = self._get_required_env("SUPABASE_URL")
         self.supabase_service_role_key: str = self._get_required_env(
             "SUPABASE_SERVICE_ROLE_KEY"
         )
         self.supabase_anon_key: Optional[str] = os.getenv("SUPABASE_ANON_KEY")
+        self.supabase_jwt_secret: Optional[str] = os.getenv("SUPABASE_JWT_SECRET")
         self.bucket: str = os.getenv("SUPABASE_BACKUP_BUCKET", "user-backups")
         self.port: Optional[int] = self._get_optional_int("PORT")
         self.log_level: str = os.getenv("LOG_LEVEL", "INFO")
@@ -37,11 +54,15 @@ class Settings:
             return None
 
 
-_settings: Optional[Settings] = None
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the application settings, built once and memoized.
 
+    A failed build (missing required variables) raises and is not cached, so
+    the next call retries once the environment is configured.
 
-def get_settings() -> Settings:
-    global _settings
-    if _settings is None:
-        _settings = Settings()
-    return _settings
\ No newline at end of file
+    Returns:
+        Settings instance
+    """
+    return Settings()
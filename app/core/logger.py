@@ -1,11 +1,17 @@
 """Logging configuration for the application."""
 
+import atexit
 import logging
 import os
+import queue
 import sys
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 from pathlib import Path
 from typing import Optional
 
+# Records buffered before the log file is written
+FILE_BUFFER_CAPACITY = 512
+
 
 def setup_logger(
     name: str = "wallyo",
@@ -15,6 +21,9 @@ def setup_logger(
     """
     Set up and configure a logger instance.
 
+    Records are handed to a QueueHandler and written by a background
+    QueueListener, so request threads never block on console or file I/O.
+
     Args:
         name: Logger name (default: "wallyo")
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -47,17 +56,31 @@ def setup_logger(
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers: list[logging.Handler] = [console_handler]
 
     # File handler (if log_file is provided)
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
 
-        file_handler = logging.FileHandler(log_file)
+        # Open the file on first write, and batch records so the disk sees one
+        # write per FILE_BUFFER_CAPACITY records (errors flush immediately)
+        file_handler = logging.FileHandler(log_file, delay=True)
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        buffered_file_handler = MemoryHandler(
+            FILE_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=file_handler
+        )
+        buffered_file_handler.setLevel(level)
+        handlers.append(buffered_file_handler)
+
+    # Enqueue records on the caller's thread; a listener thread does the writes
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Drain pending records on interpreter shutdown
+    atexit.register(listener.stop)
 
     return logger
 
@@ -1,47 +1,126 @@
 """Supabase client initialization with service role key."""
 
 from typing import Optional
-from supabase import create_client, Client
+
+import httpx
+from supabase import (
+    AsyncClient,
+    AsyncClientOptions,
+    Client,
+    ClientOptions,
+    acreate_client,
+    create_client,
+)
 from app.core.config import get_settings
 
-# Lazy-initialized Supabase client
-_supabase_client: Optional[Client] = None
+# Connection pool shared by each client's auth, storage and postgrest calls;
+# keep-alive and HTTP/2 reuse one TLS connection instead of one per call
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+HTTP_TIMEOUT = 10.0
+
+
+def _create_service_client() -> Client:
+    """Create the Supabase client authenticated with the service role key."""
+    s = get_settings()
+    http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return create_client(
+        s.supabase_url,
+        s.supabase_service_role_key,
+        options=ClientOptions(httpx_client=http_client),
+    )
+
+
+# Create the client at import so request paths get a ready instance.
+# If the environment is not configured yet (e.g. under tests), creation is
+# deferred to the first get_supabase_client() call.
+try:
+    _supabase_client: Optional[Client] = _create_service_client()
+except ValueError:
+    _supabase_client = None
 
 
 def get_supabase_client() -> Client:
     """
-    Get or create the Supabase client with service role key.
+    Get the Supabase client with service role key.
 
     This client is used for server-side operations that require elevated privileges.
-    The client is lazily initialized to avoid import-time errors.
+    It is created at import time when the environment is configured, otherwise on
+    first use.
 
     Returns:
         Supabase Client instance
     """
     global _supabase_client
     if _supabase_client is None:
-        s = get_settings()
-        _supabase_client = create_client(
-            s.supabase_url, s.supabase_service_role_key
-        )
+        _supabase_client = _create_service_client()
     return _supabase_client
 
 
-# For backward compatibility, provide module-level access
-# Accessing this will lazily initialize the client
-def _get_supabase() -> Client:
-    """Get Supabase client (internal function)."""
-    return get_supabase_client()
+_async_supabase_client: Optional[AsyncClient] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Get or create the async connection pool shared by all Supabase requests.
+
+    Used by the async service client and by per-user storage clients, which
+    send their own headers on every request.
+
+    Returns:
+        httpx AsyncClient instance
+    """
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(
+            http2=True,
+            limits=HTTP_LIMITS,
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+        )
+    return _async_http_client
+
 
+async def get_async_supabase_client() -> AsyncClient:
+    """
+    Get or create the async Supabase client with service role key.
 
-# Create a module-level attribute that lazily initializes
-class _LazySupabase:
-    """Lazy wrapper for Supabase client."""
+    Used by the storage repository so network round-trips do not block the
+    event loop. Created on first use because client setup must be awaited.
 
-    def __getattr__(self, name: str) -> any:
-        """Delegate attribute access to the actual Supabase client."""
-        return getattr(get_supabase_client(), name)
+    Returns:
+        Supabase AsyncClient instance
+    """
+    global _async_supabase_client
+    if _async_supabase_client is None:
+        s = get_settings()
+        _async_supabase_client = await acreate_client(
+            s.supabase_url,
+            s.supabase_service_role_key,
+            options=AsyncClientOptions(httpx_client=get_async_http_client()),
+        )
+    return _async_supabase_client
+
+
+async def close_async_supabase_client() -> None:
+    """Close the shared async connection pool and drop the async client."""
+    global _async_supabase_client, _async_http_client
+    _async_supabase_client = None
+    if _async_http_client is not None:
+        http_client = _async_http_client
+        _async_http_client = None
+        await http_client.aclose()
 
 
-# Module-level supabase object that lazily initializes
-supabase = _LazySupabase()
+def __getattr__(name: str) -> Client:
+    """
+    Resolve the module-level ``supabase`` client on first access (PEP 562).
+
+    The client is bound as a module global, so later lookups are plain
+    attribute reads that never reach this function.
+    """
+    if name == "supabase":
+        client = get_supabase_client()
+        globals()["supabase"] = client
+        return client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
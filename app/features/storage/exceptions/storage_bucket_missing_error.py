@@ -0,0 +1,11 @@
+from typing import Optional
+
+from app.features.storage.exceptions.storage_error import StorageError
+
+
+class StorageBucketMissingError(StorageError):
+    """Raised when the storage bucket does not exist or is not accessible."""
+
+    def __init__(self, bucket_name: str, message: Optional[str] = None):
+        self.bucket_name = bucket_name
+        super().__init__(message or f"Bucket '{bucket_name}' does not exist.")
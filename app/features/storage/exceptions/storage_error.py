@@ -0,0 +1,6 @@
+class StorageError(Exception):
+    """Base class for errors raised by the storage repository."""
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,11 @@
+from typing import Optional
+
+from app.features.storage.exceptions.storage_error import StorageError
+
+
+class StorageNotFoundError(StorageError):
+    """Raised when a storage object does not exist."""
+
+    def __init__(self, path: str, message: Optional[str] = None):
+        self.path = path
+        super().__init__(message or f"File not found at path: {path}")
@@ -0,0 +1,5 @@
+from app.features.storage.exceptions.storage_error import StorageError
+
+
+class StorageRLSViolationError(StorageError):
+    """Raised when a storage row-level security policy rejects the request."""
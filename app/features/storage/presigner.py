@@ -0,0 +1,127 @@
+"""Local signing of Supabase Storage upload and download URLs."""
+
+import base64
+import hashlib
+import hmac
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+import orjson
+from storage3.types import SignedUploadURL, SignedUrlResponse
+
+from app.core.config import get_settings
+
+# Validity of signed upload URLs, matching Supabase Storage's own default
+SIGNED_UPLOAD_URL_TTL = 2 * 60 * 60
+
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# Every token shares this header, so its encoded segment is built once
+_JWT_HEADER_SEGMENT = _b64url(orjson.dumps({"alg": "HS256", "typ": "JWT"}))
+
+
+class LocalPresigner:
+    """
+    Sign Storage URLs in-process instead of asking Supabase for them.
+
+    Supabase Storage signs its URL tokens as HS256 JWTs over
+    ``{bucket}/{path}`` with the project's JWT secret, so holding the secret
+    lets the API mint identical tokens without a network round-trip.
+    Storage policies are not consulted; callers must check path ownership.
+    """
+
+    __slots__ = ("_mac", "_storage_url", "bucket_name")
+
+    def __init__(self, jwt_secret: str, supabase_url: str, bucket_name: str) -> None:
+        """
+        Initialize the presigner.
+
+        Args:
+            jwt_secret: Supabase project JWT secret
+            supabase_url: Supabase project URL
+            bucket_name: Storage bucket the URLs point into
+        """
+        # Keyed once; each token copies the keyed state instead of re-deriving it
+        self._mac = hmac.new(jwt_secret.encode(), digestmod=hashlib.sha256)
+        self._storage_url = f"{supabase_url.rstrip('/')}/storage/v1"
+        self.bucket_name = bucket_name
+
+    def _sign(self, claims: Dict[str, Any], expires_in: int) -> str:
+        now = int(time.time())
+        payload = {**claims, "iat": now, "exp": now + expires_in}
+        signing_input = _JWT_HEADER_SEGMENT + b"." + _b64url(orjson.dumps(payload))
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return (signing_input + b"." + _b64url(mac.digest())).decode()
+
+    def create_signed_upload_url(
+        self, path: str, owner: str, upsert: bool = False
+    ) -> SignedUploadURL:
+        """
+        Sign an upload URL for a storage object.
+
+        Args:
+            path: Full object path (e.g., "user_id/latest.json")
+            owner: Supabase user UUID recorded as the object's owner
+            upsert: Whether the upload may overwrite an existing object
+
+        Returns:
+            Dict with signed_url, token and path, shaped like Supabase's response
+        """
+        object_url = f"{self.bucket_name}/{path}"
+        token = self._sign(
+            {"owner": owner, "url": object_url, "upsert": upsert},
+            SIGNED_UPLOAD_URL_TTL,
+        )
+        signed_url = (
+            f"{self._storage_url}/object/upload/sign/{quote(object_url)}?token={token}"
+        )
+        return {
+            "signed_url": signed_url,
+            "signedUrl": signed_url,
+            "token": token,
+            "path": path,
+        }
+
+    def create_signed_download_url(
+        self, path: str, expires_in: int
+    ) -> SignedUrlResponse:
+        """
+        Sign a download URL for a storage object.
+
+        Existence is not checked; a missing object surfaces when the URL is
+        fetched.
+
+        Args:
+            path: Full object path (e.g., "user_id/latest.json")
+            expires_in: URL validity duration in seconds
+
+        Returns:
+            Dict with signedURL, shaped like Supabase's response
+        """
+        object_url = f"{self.bucket_name}/{path}"
+        token = self._sign({"url": object_url}, expires_in)
+        signed_url = (
+            f"{self._storage_url}/object/sign/{quote(object_url)}?token={token}"
+        )
+        return {"signedURL": signed_url, "signedUrl": signed_url}
+
+
+def create_local_presigner() -> Optional[LocalPresigner]:
+    """
+    Build a presigner from settings.
+
+    Returns:
+        LocalPresigner instance, or None when SUPABASE_JWT_SECRET is not set
+
+    Raises:
+        ValueError: If required environment variables are missing
+    """
+    s = get_settings()
+    if not s.supabase_jwt_secret:
+        return None
+    return LocalPresigner(s.supabase_jwt_secret, s.supabase_url, s.bucket)
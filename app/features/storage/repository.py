@@ -1,20 +1,180 @@
-from typing import Dict, Any, List, Optional
-from storage3.types import SignedUploadURL
-from supabase import StorageException, create_client
+import asyncio
+from collections import OrderedDict
+from typing import (
+    AsyncGenerator,
+    Dict,
+    Any,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypedDict,
+    Union,
+)
+import httpx
+import jwt
+from storage3.exceptions import StorageApiError
+from storage3.types import (
+    CreateSignedUploadUrlOptions,
+    ListBucketFilesOptions,
+    SignedUploadURL,
+    SignedUrlResponse,
+)
+from storage3 import AsyncStorageClient
+from supabase import StorageException
+from app.core.auth import token_digest
+from app.core.config import get_settings
 from app.core.logger import logger
-import os
+from app.core.supabase import get_async_http_client, get_async_supabase_client
+from app.features.storage.exceptions.storage_bucket_missing_error import (
+    StorageBucketMissingError,
+)
+from app.features.storage.exceptions.storage_error import StorageError
+from app.features.storage.exceptions.storage_not_found_error import (
+    StorageNotFoundError,
+)
+from app.features.storage.exceptions.storage_rls_violation_error import (
+    StorageRLSViolationError,
+)
+import threading
+import time
+
+# Per-user storage clients are reused across requests, keyed by the SHA-256
+# digest of the user's JWT so raw tokens are never held as cache keys. Each
+# entry records the connection pool it was built on and is rebuilt once that
+# pool has been closed and replaced
+USER_CLIENT_CACHE_MAXSIZE = 1024
+USER_CLIENT_CACHE_TTL = 600  # Upper bound in seconds, tightened by the JWT exp claim
+
+_UserClientEntry = Tuple[AsyncStorageClient, float, httpx.AsyncClient]
+_user_clients: "OrderedDict[bytes, _UserClientEntry]" = OrderedDict()
+_user_clients_lock = threading.Lock()
+
+# Storage error codes and lowercase message fragments used to classify errors
+_RLS_MARKERS = ("row-level security policy",)
+_NOT_FOUND_CODES = frozenset({"NoSuchKey", "not_found"})
+_NOT_FOUND_MARKERS = ("does not exist", "not found")
+_BUCKET_UNAVAILABLE_CODES = frozenset({"NoSuchBucket", "InvalidRequest"})
+
+
+class SortBy(TypedDict, total=False):
+    """Sort order accepted by storage listings."""
+
+    column: str
+    order: Literal["asc", "desc"]
+
+
+# Storage caps each listing; larger folders are read page by page
+LIST_PAGE_SIZE = 1000
+# Backup names start with their timestamp, so name-descending is newest first
+NEWEST_FIRST: SortBy = {"column": "name", "order": "desc"}
+
+# Storage removes up to 1000 paths per request; larger deletes are split
+# into batches removed concurrently
+DELETE_BATCH_SIZE = 1000
+DELETE_MAX_CONCURRENCY = 8
+
+# Signed download URLs are reused for half their validity window, keyed by
+# bucket, path, expiry and a digest of the caller's JWT
+SIGNED_URL_CACHE_MAXSIZE = 10_000
+SIGNED_URL_MIN_TTL = 10  # Seconds; shorter-lived URLs are not cached
+
+_SignedUrlKey = Tuple[str, str, int, bytes]
+_signed_urls: "OrderedDict[_SignedUrlKey, Tuple[SignedUrlResponse, float]]" = (
+    OrderedDict()
+)
+_signed_urls_lock = threading.Lock()
+
+
+def _client_expires_at(user_token: str) -> float:
+    """Return when a client built for this token should stop being reused."""
+    expires_at = time.time() + USER_CLIENT_CACHE_TTL
+    try:
+        exp = jwt.decode(user_token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        return expires_at
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, float(exp))
+    return expires_at
+
+
+def _error_fields(error: Union[StorageException, Dict[str, Any]]) -> Tuple[Any, str]:
+    """Unpack (code, message) from a storage exception or error payload."""
+    if isinstance(error, StorageApiError):
+        return error.code or "Unknown", str(error.message or "Unknown error")
+    if isinstance(error, StorageException):
+        error = error.args[0] if error.args and isinstance(error.args[0], dict) else {}
+    code = error.get("error") or error.get("code") or "Unknown"
+    return code, str(error.get("message") or "Unknown error")
+
+
+def _classify_storage_error(error_code: Any, error_message: Any) -> str:
+    """
+    Classify a storage error from its code and message.
+
+    Returns:
+        "rls" for row-level security rejections, "bucket" when the bucket is
+        missing or inaccessible, "missing" when the object does not exist,
+        otherwise "other"
+    """
+    message = str(error_message)
+    lowered = message.lower()
+    # "RLS" is matched case-sensitively so words like "urls" don't qualify
+    if "RLS" in message or any(marker in lowered for marker in _RLS_MARKERS):
+        return "rls"
+    if error_code in _BUCKET_UNAVAILABLE_CODES:
+        return "bucket"
+    if error_code in _NOT_FOUND_CODES or any(
+        marker in lowered for marker in _NOT_FOUND_MARKERS
+    ):
+        return "missing"
+    return "other"
 
 
 class StorageRepository:
-    def __init__(self, bucket_name: str = "") -> None:
-        self.bucket_name = bucket_name or os.getenv(
-            "SUPABASE_BACKUP_BUCKET", "user-backups"
-        )
-        logger.debug(f"StorageRepository initialized with bucket: {self.bucket_name}")
+    __slots__ = ("_bucket_name",)
 
-    def _get_user_client(self, user_token: str):
-        from app.core.config import get_settings
+    def __init__(self, bucket_name: str = "") -> None:
+        # Empty means the configured bucket, read from settings on first use so
+        # the repository can be built before the environment is configured
+        self._bucket_name = bucket_name
+
+    @property
+    def bucket_name(self) -> str:
+        if not self._bucket_name:
+            self._bucket_name = get_settings().bucket
+            logger.debug("StorageRepository using bucket: %s", self._bucket_name)
+        return self._bucket_name
+
+    async def _get_client(self, user_token: Optional[str]) -> AsyncStorageClient:
+        if user_token:
+            return self._get_user_client(user_token)
+        return (await get_async_supabase_client()).storage
+
+    def _get_user_client(self, user_token: str) -> AsyncStorageClient:
+        key = token_digest(user_token)
+        pool = get_async_http_client()
+        with _user_clients_lock:
+            entry = _user_clients.get(key)
+            if entry is not None:
+                client, expires_at, client_pool = entry
+                if client_pool is pool and expires_at > time.time():
+                    _user_clients.move_to_end(key)
+                    return client
+                # The token has expired or the client's pool has been closed,
+                # so the client is no longer usable
+                del _user_clients[key]
+
+        client = self._create_user_client(user_token)
+
+        with _user_clients_lock:
+            _user_clients[key] = (client, _client_expires_at(user_token), pool)
+            _user_clients.move_to_end(key)
+            if len(_user_clients) > USER_CLIENT_CACHE_MAXSIZE:
+                _user_clients.popitem(last=False)
+        return client
 
+    def _create_user_client(self, user_token: str) -> AsyncStorageClient:
         s = get_settings()
         if not s.supabase_anon_key:
             error_msg = (
@@ -23,193 +183,288 @@ class StorageRepository:
             )
             logger.error(error_msg)
             raise ValueError(error_msg)
-        logger.debug("Creating Supabase client with anon key and user token for RLS")
-        client = create_client(s.supabase_url, s.supabase_anon_key)
-        client.auth.set_session(access_token=user_token, refresh_token="")
-        return client
+        logger.debug("Creating storage client with anon key and user token for RLS")
+        # Storage only needs the JWT as a bearer header, so the auth client and
+        # its session handling are skipped; connections come from the shared pool
+        return AsyncStorageClient(
+            url=f"{s.supabase_url.rstrip('/')}/storage/v1/",
+            headers={
+                "apiKey": s.supabase_anon_key,
+                "Authorization": f"Bearer {user_token}",
+            },
+            http_client=get_async_http_client(),
+        )
 
-    def create_signed_upload_url(
+    async def create_signed_upload_url(
         self, path: str, user_token: Optional[str] = None
-    ) -> Dict[str, Any]:
-        if user_token:
-            supabase = self._get_user_client(user_token)
-        else:
-            from app.core.supabase import get_supabase_client
-
-            supabase = get_supabase_client()
+    ) -> SignedUploadURL:
+        storage = await self._get_client(user_token)
         logger.debug(
-            f"Creating signed upload URL for path: {path} in bucket: {self.bucket_name}"
+            "Creating signed upload URL for path: %s in bucket: %s",
+            path,
+            self.bucket_name,
         )
 
-        # For files that may already exist (like latest.json), delete first to allow overwrite
-        # This is simpler and more reliable than detecting "already exists" errors
-        if path.endswith("latest.json"):
-            try:
-                logger.debug(f"Deleting existing {path} to allow overwrite")
-                self.delete_files([path], user_token)
-            except Exception as e:
-                # File might not exist, that's fine
-                logger.debug(f"Could not delete {path} (may not exist): {e}")
-
-        result = supabase.storage.from_(self.bucket_name).create_signed_upload_url(path)
-        self.__check_for_errors_in_create_signed_upload_result(result)
+        bucket = storage.from_(self.bucket_name)
+        try:
+            if path.endswith("latest.json"):
+                # latest.json is rewritten on every backup; an upsert token lets
+                # the client overwrite it without a delete round-trip beforehand
+                result = await bucket.create_signed_upload_url(
+                    path, CreateSignedUploadUrlOptions(upsert="true")
+                )
+            else:
+                result = await bucket.create_signed_upload_url(path)
+        except StorageException as e:
+            error_code, error_message = _error_fields(e)
+
+            kind = _classify_storage_error(error_code, error_message)
+            if kind == "rls":
+                error: StorageError = StorageRLSViolationError(
+                    f"RLS policy violation: {error_message}. "
+                    f"Check storage RLS policies in Supabase Dashboard."
+                )
+            elif kind == "bucket":
+                error = StorageBucketMissingError(
+                    self.bucket_name,
+                    f"Bucket '{self.bucket_name}' does not exist or is not accessible.",
+                )
+            else:
+                error = StorageError(
+                    f"Storage error: {error_message} (code: {error_code})"
+                )
+
+            logger.error("Storage error: %s", error)
+            raise error from e
         return result
 
-    def object_exists(
-        self, path: str, user_token: Optional[str] = None
-    ) -> tuple[bool, Optional[Dict[str, Any]]]:
-        if user_token:
-            supabase = self._get_user_client(user_token)
-        else:
-            from app.core.supabase import get_supabase_client
+    async def object_exists(self, path: str, user_token: Optional[str] = None) -> bool:
+        """
+        Check whether an object exists with a HEAD request.
+
+        Args:
+            path: Full object path (e.g., "user_id/latest.json")
+            user_token: User's JWT token for RLS policy evaluation
+
+        Returns:
+            True if the object exists, False otherwise
 
-            supabase = get_supabase_client()
+        Raises:
+            StorageRLSViolationError: If RLS policies deny the check
+            StorageBucketMissingError: If the bucket is unavailable
+            StorageError: For any other storage failure
+        """
+        storage = await self._get_client(user_token)
         logger.debug(
-            f"Checking object existence for path: {path} in bucket: {self.bucket_name}"
+            "Checking object existence for path: %s in bucket: %s",
+            path,
+            self.bucket_name,
         )
         try:
-            probe = supabase.storage.from_(self.bucket_name).create_signed_url(
-                path=path, expires_in=120
-            )
+            exists = await storage.from_(self.bucket_name).exists(path)
         except StorageException as e:
-            error_detail = e.args[0] if e.args and isinstance(e.args[0], dict) else {}
-            error_message = error_detail.get("message", "Unknown error")
-            error_code = error_detail.get("error", error_detail.get("code", "Unknown"))
-            if (
-                error_code == "NoSuchKey"
-                or "does not exist" in error_message
-                or "not found" in error_message.lower()
-            ):
-                logger.info(f"Object does not exist at path: {path}")
-                return False, None
-            raise
-
-        if not probe:
-            return False, None
-
-        # Supabase returns error info at top level: {'statusCode': 404, 'error': 'not_found', 'message': 'Object not found'}
-        if probe.get("error") or probe.get("statusCode"):
-            error_message = probe.get("message", "Unknown error")
-            error_code = probe.get("error", probe.get("code", "Unknown"))
-            if (
-                error_code == "NoSuchKey"
-                or error_code == "not_found"
-                or "does not exist" in str(error_message).lower()
-                or "not found" in str(error_message).lower()
-            ):
-                logger.info(f"Object does not exist at path: {path}")
-                return False, None
-            raise Exception(
-                f"Error checking existence: {error_message} (code: {error_code})"
-            )
+            error_code, error_message = _error_fields(e)
 
-        return True, probe
+            kind = _classify_storage_error(error_code, error_message)
+            if kind == "rls":
+                error: StorageError = StorageRLSViolationError(
+                    f"RLS policy violation: {error_message}. Check storage policies."
+                )
+            elif kind == "bucket":
+                error = StorageBucketMissingError(self.bucket_name)
+            else:
+                error = StorageError(
+                    f"Error checking existence: {error_message} (code: {error_code})"
+                )
 
-    def create_signed_download_url(
-        self, path: str, expires_in: int, user_token: Optional[str] = None
-    ) -> Dict[str, Any]:
-        if user_token:
-            supabase = self._get_user_client(user_token)
-        else:
-            from app.core.supabase import get_supabase_client
+            logger.error("Storage error: %s", error)
+            raise error from e
 
-            supabase = get_supabase_client()
-        logger.debug(
-            f"Creating signed download URL for path: {path} in bucket: {self.bucket_name}, expires_in: {expires_in}s"
+        if not exists:
+            logger.info("Object does not exist at path: %s", path)
+        return exists
+
+    async def create_signed_download_url(
+        self, path: str, expires_in: int, user_token: Optional[str] = None
+    ) -> SignedUrlResponse:
+        cache_key = (
+            self.bucket_name,
+            path,
+            expires_in,
+            token_digest(user_token) if user_token else b"",
         )
-        result = supabase.storage.from_(self.bucket_name).create_signed_url(
-            path=path, expires_in=expires_in
+        with _signed_urls_lock:
+            entry = _signed_urls.get(cache_key)
+            if entry is not None:
+                cached, reuse_until = entry
+                if reuse_until > time.time():
+                    _signed_urls.move_to_end(cache_key)
+                    logger.debug("Signed download URL cache hit for path: %s", path)
+                    return cached
+                del _signed_urls[cache_key]
+
+        storage = await self._get_client(user_token)
+        logger.debug(
+            "Creating signed download URL for path: %s in bucket: %s, expires_in: %ss",
+            path,
+            self.bucket_name,
+            expires_in,
         )
-        # Supabase returns error info at top level: {'statusCode': 404, 'error': 'not_found', 'message': 'Object not found'}
-        if result.get("error") or result.get("statusCode"):
-            error_message = str(result.get("message", "Unknown error"))
-            error_code = result.get("error", result.get("code", "Unknown"))
-            if "row-level security policy" in error_message or "RLS" in error_message:
-                error_msg = (
+        try:
+            result = await storage.from_(self.bucket_name).create_signed_url(
+                path=path, expires_in=expires_in
+            )
+        except StorageException as e:
+            error_code, error_message = _error_fields(e)
+            kind = _classify_storage_error(error_code, error_message)
+            if kind == "rls":
+                error: StorageError = StorageRLSViolationError(
                     f"RLS policy violation: {error_message}. "
                     f"You need to create RLS policies on storage.objects table. "
                     f"Go to Supabase Dashboard > SQL Editor and run the policies SQL. "
                     f"See the README or documentation for the required SQL."
                 )
-            elif error_code == "NoSuchBucket" or error_code == "InvalidRequest":
-                error_msg = (
+            elif kind == "bucket":
+                error = StorageBucketMissingError(
+                    self.bucket_name,
                     f"Bucket '{self.bucket_name}' does not exist or is not accessible. "
-                    f"Please verify it exists in Supabase Dashboard: Storage > Buckets"
+                    f"Please verify it exists in Supabase Dashboard: Storage > Buckets",
                 )
-            elif (
-                error_code == "NoSuchKey"
-                or error_code == "not_found"
-                or "not found" in error_message.lower()
-            ):
-                error_msg = f"File not found at path: {path}"
+            elif kind == "missing":
+                error = StorageNotFoundError(path)
             else:
-                error_msg = (
+                error = StorageError(
                     f"Error creating signed URL: {error_message} (code: {error_code})"
                 )
-            logger.error(f"Storage error: {error_msg}")
-            raise Exception(error_msg)
+            logger.error("Storage error: %s", error)
+            raise error from e
+        cache_ttl = expires_in // 2
+        if cache_ttl >= SIGNED_URL_MIN_TTL:
+            with _signed_urls_lock:
+                _signed_urls[cache_key] = (result, time.time() + cache_ttl)
+                _signed_urls.move_to_end(cache_key)
+                if len(_signed_urls) > SIGNED_URL_CACHE_MAXSIZE:
+                    _signed_urls.popitem(last=False)
         return result
 
-    def list_user_files(
-        self, user_id: str, user_token: Optional[str] = None
+    async def list_user_files(
+        self,
+        user_id: str,
+        user_token: Optional[str] = None,
+        limit: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
-        List all files in a user's storage directory.
+        List files in a user's storage directory.
 
         Args:
             user_id: Supabase user UUID (used as directory prefix)
             user_token: User's JWT token for RLS policy evaluation
+            limit: When set, return at most this many files, sorted by name
+                descending (newest backups first) in a single request
 
         Returns:
             List of file objects with name, id, updated_at, created_at, metadata
         """
-        if user_token:
-            supabase = self._get_user_client(user_token)
+        if limit is not None:
+            files = []
+            pages = self.iter_user_files(
+                user_id, user_token, page_size=limit, sort_by=NEWEST_FIRST
+            )
+            try:
+                async for item in pages:
+                    files.append(item)
+                    if len(files) >= limit:
+                        break
+            finally:
+                # Close now rather than leaving it to the loop's finalizer
+                await pages.aclose()
         else:
-            from app.core.supabase import get_supabase_client
+            files = [item async for item in self.iter_user_files(user_id, user_token)]
+        logger.debug("Found %s files for user: %s", len(files), user_id)
+        return files
+
+    async def iter_user_files(
+        self,
+        user_id: str,
+        user_token: Optional[str] = None,
+        page_size: int = LIST_PAGE_SIZE,
+        sort_by: Optional[SortBy] = None,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Yield the files in a user's storage directory, one page at a time.
 
-            supabase = get_supabase_client()
+        Storage caps each listing at a page size, so folders larger than one
+        page are walked with increasing offsets until a short page is returned.
 
-        logger.debug(
-            f"Listing files for user: {user_id} in bucket: {self.bucket_name}"
-        )
+        Args:
+            user_id: Supabase user UUID (used as directory prefix)
+            user_token: User's JWT token for RLS policy evaluation
+            page_size: Number of files requested per listing call
+            sort_by: Storage sort order, e.g. NEWEST_FIRST; defaults to name
+                ascending
 
-        try:
-            result = supabase.storage.from_(self.bucket_name).list(path=user_id)
-            if isinstance(result, list):
-                logger.debug(f"Found {len(result)} files for user: {user_id}")
-                return result
-            return []
-        except StorageException as e:
-            error_detail = e.args[0] if e.args and isinstance(e.args[0], dict) else {}
-            error_message = error_detail.get("message", "Unknown error")
-            error_code = error_detail.get("error", error_detail.get("code", "Unknown"))
-
-            # Empty directory or not found is not an error
-            if (
-                error_code == "NoSuchKey"
-                or "not found" in error_message.lower()
-                or "does not exist" in error_message.lower()
-            ):
-                logger.debug(f"No files found for user: {user_id}")
-                return []
-
-            if "row-level security policy" in error_message or "RLS" in error_message:
-                error_msg = f"RLS policy violation: {error_message}. Check storage policies."
-            elif error_code == "NoSuchBucket" or "does not exist" in error_message:
-                error_msg = f"Bucket '{self.bucket_name}' does not exist."
-            else:
-                error_msg = f"Error listing files: {error_message} (code: {error_code})"
+        Yields:
+            File objects with name, id, updated_at, created_at, metadata
 
-            logger.error(f"Storage error: {error_msg}")
-            raise Exception(error_msg)
+        Raises:
+            StorageRLSViolationError: If RLS policies deny the listing
+            StorageBucketMissingError: If the bucket is unavailable
+            StorageError: For any other storage failure
+        """
+        storage = await self._get_client(user_token)
+        bucket = storage.from_(self.bucket_name)
 
-    def delete_files(
+        logger.debug(
+            "Listing files for user: %s in bucket: %s",
+            user_id,
+            self.bucket_name,
+        )
+
+        offset = 0
+        while True:
+            options = ListBucketFilesOptions(limit=page_size, offset=offset)
+            if sort_by is not None:
+                options["sortBy"] = sort_by
+            try:
+                result = await bucket.list(path=user_id, options=options)
+            except StorageException as e:
+                error_code, error_message = _error_fields(e)
+
+                kind = _classify_storage_error(error_code, error_message)
+
+                # Empty directory or not found is not an error
+                if kind == "missing":
+                    logger.debug("No files found for user: %s", user_id)
+                    return
+
+                if kind == "rls":
+                    error: StorageError = StorageRLSViolationError(
+                        f"RLS policy violation: {error_message}. Check storage policies."
+                    )
+                elif kind == "bucket":
+                    error = StorageBucketMissingError(self.bucket_name)
+                else:
+                    error = StorageError(
+                        f"Error listing files: {error_message} (code: {error_code})"
+                    )
+
+                logger.error("Storage error: %s", error)
+                raise error from e
+
+            for item in result:
+                yield item
+            if len(result) < page_size:
+                return
+            offset += page_size
+
+    async def delete_files(
         self, paths: List[str], user_token: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Delete multiple files from storage.
 
+        Paths are removed with one request per DELETE_BATCH_SIZE paths.
+
         Args:
             paths: List of full paths to delete (e.g., ["user_id/file1.db.enc"])
             user_token: User's JWT token for RLS policy evaluation
@@ -220,61 +475,50 @@ class StorageRepository:
         if not paths:
             return []
 
-        if user_token:
-            supabase = self._get_user_client(user_token)
-        else:
-            from app.core.supabase import get_supabase_client
+        storage = await self._get_client(user_token)
 
-            supabase = get_supabase_client()
-
-        logger.debug(
-            f"Deleting {len(paths)} files from bucket: {self.bucket_name}"
-        )
+        logger.debug("Deleting %s files from bucket: %s", len(paths), self.bucket_name)
 
+        bucket = storage.from_(self.bucket_name)
         try:
-            result = supabase.storage.from_(self.bucket_name).remove(paths)
-            logger.debug(f"Successfully deleted {len(paths)} files")
-            return result if isinstance(result, list) else []
-        except StorageException as e:
-            error_detail = e.args[0] if e.args and isinstance(e.args[0], dict) else {}
-            error_message = error_detail.get("message", "Unknown error")
-            error_code = error_detail.get("error", error_detail.get("code", "Unknown"))
-
-            if "row-level security policy" in error_message or "RLS" in error_message:
-                error_msg = f"RLS policy violation: {error_message}. Check storage policies."
-            elif error_code == "NoSuchBucket" or "does not exist" in error_message:
-                error_msg = f"Bucket '{self.bucket_name}' does not exist."
+            if len(paths) <= DELETE_BATCH_SIZE:
+                result = await bucket.remove(paths)
+                deleted = result if isinstance(result, list) else []
             else:
-                error_msg = f"Error deleting files: {error_message} (code: {error_code})"
-
-            logger.error(f"Storage error: {error_msg}")
-            raise Exception(error_msg)
+                semaphore = asyncio.Semaphore(DELETE_MAX_CONCURRENCY)
 
-    def __check_for_errors_in_create_signed_upload_result(
-        self, result: SignedUploadURL
-    ) -> None:
-        """Check for errors in create_signed_upload_url result.
+                async def remove_batch(batch: List[str]) -> Any:
+                    async with semaphore:
+                        return await bucket.remove(batch)
 
-        Raises:
-            Exception if result contains an error
-        """
-        # Handle top-level error structure from Supabase
-        # e.g., {'statusCode': 400, 'error': 'Duplicate', 'message': 'The resource already exists'}
-        if result.get("error") or result.get("statusCode"):
-            error_message = str(result.get("message", "Unknown error"))
-            error_code = result.get("error", result.get("code", "Unknown"))
-
-            if "row-level security policy" in error_message or "RLS" in error_message:
-                error_msg = (
-                    f"RLS policy violation: {error_message}. "
-                    f"Check storage RLS policies in Supabase Dashboard."
+                results = await asyncio.gather(
+                    *(
+                        remove_batch(paths[i : i + DELETE_BATCH_SIZE])
+                        for i in range(0, len(paths), DELETE_BATCH_SIZE)
+                    )
                 )
-            elif error_code == "NoSuchBucket" or error_code == "InvalidRequest":
-                error_msg = (
-                    f"Bucket '{self.bucket_name}' does not exist or is not accessible."
+                deleted = [
+                    item
+                    for result in results
+                    if isinstance(result, list)
+                    for item in result
+                ]
+            logger.debug("Successfully deleted %s files", len(paths))
+            return deleted
+        except StorageException as e:
+            error_code, error_message = _error_fields(e)
+
+            kind = _classify_storage_error(error_code, error_message)
+            if kind == "rls":
+                error: StorageError = StorageRLSViolationError(
+                    f"RLS policy violation: {error_message}. Check storage policies."
                 )
+            elif kind == "bucket":
+                error = StorageBucketMissingError(self.bucket_name)
             else:
-                error_msg = f"Storage error: {error_message} (code: {error_code})"
+                error = StorageError(
+                    f"Error deleting files: {error_message} (code: {error_code})"
+                )
 
-            logger.error(f"Storage error: {error_msg}")
-            raise Exception(error_msg)
+            logger.error("Storage error: %s", error)
+            raise error from e
@@ -1,8 +1,10 @@
 """API routes for storage feature."""
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from app.core.auth import get_user_id, get_user_token
 from app.core.logger import logger
+from app.features.storage.presigner import create_local_presigner
 from app.features.storage.repository import StorageRepository
 from app.features.storage.service import StorageService
 from app.features.storage.schemas import (
@@ -12,11 +14,26 @@ from app.features.storage.schemas import (
     PresignDownloadRes,
 )
 
-router = APIRouter(prefix="/api/v1/storage", tags=["storage"])
+router = APIRouter(
+    prefix="/api/v1/storage",
+    tags=["storage"],
+    default_response_class=ORJSONResponse,
+)
+
+# Repository and service are stateless, so one instance serves all requests
+_storage_repository = StorageRepository()
+
+# URLs are signed locally when the JWT secret is configured. If the environment
+# is not configured yet (e.g. under tests), Supabase signs them instead.
+try:
+    _local_presigner = create_local_presigner()
+except ValueError:
+    _local_presigner = None
+_storage_service = StorageService(_storage_repository, _local_presigner)
+
 
 def get_storage_service() -> StorageService:
-    repository = StorageRepository()
-    return StorageService(repository)
+    return _storage_service
 
 
 @router.post("/presign-upload", response_model=PresignUploadRes)
@@ -26,13 +43,26 @@ async def presign_upload(
     user_token: str = Depends(get_user_token),
     service: StorageService = Depends(get_storage_service),
 ) -> PresignUploadRes:
-    logger.info(f"Presign upload request received - user_id: {user_id}, filename: {body.filename}")
+    logger.info(
+        "Presign upload request received - user_id: %s, filename: %s",
+        user_id,
+        body.filename,
+    )
     try:
         result = await service.presign_upload(user_id, body.filename, user_token)
-        logger.info(f"Presign upload successful - user_id: {user_id}, path: {result.path}")
+        logger.info(
+            "Presign upload successful - user_id: %s, path: %s",
+            user_id,
+            result.path,
+        )
         return result
     except Exception as e:
-        logger.error(f"Presign upload failed - user_id: {user_id}, filename: {body.filename}, error: {str(e)}")
+        logger.error(
+            "Presign upload failed - user_id: %s, filename: %s, error: %s",
+            user_id,
+            body.filename,
+            e,
+        )
         raise
 
 
@@ -43,13 +73,27 @@ async def presign_download(
     user_token: str = Depends(get_user_token),
     service: StorageService = Depends(get_storage_service),
 ) -> PresignDownloadRes:
-    logger.info(f"Presign download request received - user_id: {user_id}, path: {body.path}, seconds: {body.seconds}")
+    logger.info(
+        "Presign download request received - user_id: %s, path: %s, seconds: %s",
+        user_id,
+        body.path,
+        body.seconds,
+    )
     try:
         result = await service.presign_download(
             user_id, body.path, body.seconds, user_token
         )
-        logger.info(f"Presign download successful - user_id: {user_id}, path: {body.path}")
+        logger.info(
+            "Presign download successful - user_id: %s, path: %s",
+            user_id,
+            body.path,
+        )
         return result
     except Exception as e:
-        logger.error(f"Presign download failed - user_id: {user_id}, path: {body.path}, error: {str(e)}")
+        logger.error(
+            "Presign download failed - user_id: %s, path: %s, error: %s",
+            user_id,
+            body.path,
+            e,
+        )
         raise
@@ -1,6 +1,6 @@
 """Pydantic schemas for storage feature."""
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class PresignUploadReq(BaseModel):
@@ -10,14 +10,13 @@ class PresignUploadReq(BaseModel):
         ..., description="Filename for the backup (e.g., 'wallyo.db.enc')"
     )
 
-    class Config:
-        """Pydantic config."""
-
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "filename": "wallyo.db.enc",
             }
-        }
+        },
+    )
 
 
 class PresignUploadRes(BaseModel):
@@ -30,17 +29,17 @@ class PresignUploadRes(BaseModel):
         ..., description="Signed upload token for the latest.json manifest"
     )
 
-    class Config:
-        """Pydantic config."""
-
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "path": "backups/123e4567-e89b-12d3-a456-426614174000/2025-12-06T11-20-45-a1b2c3.db.enc",
                 "token": "signed-upload-token",
                 "latest_path": "backups/123e4567-e89b-12d3-a456-426614174000/latest.json",
                 "latest_token": "signed-upload-token",
             }
-        }
+        },
+    )
 
 
 class PresignDownloadReq(BaseModel):
@@ -57,15 +56,14 @@ class PresignDownloadReq(BaseModel):
         description="URL validity duration in seconds (1-3600)",
     )
 
-    class Config:
-        """Pydantic config."""
-
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "path": "backups/123e4567-e89b-12d3-a456-426614174000/latest.json",
                 "seconds": 900,
             }
-        }
+        },
+    )
 
 
 class PresignDownloadRes(BaseModel):
@@ -73,12 +71,12 @@ class PresignDownloadRes(BaseModel):
 
     url: str = Field(..., description="Signed download URL")
 
-    class Config:
-        """Pydantic config."""
-
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "url": "https://signed-download-url",
             }
-        }
+        },
+    )
 
@@ -1,11 +1,19 @@
 """Service layer for storage operations."""
 
-import secrets
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 from fastapi import HTTPException
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import unquote
 from app.core.logger import logger
+from app.features.storage.exceptions.storage_error import StorageError
+from app.features.storage.exceptions.storage_not_found_error import (
+    StorageNotFoundError,
+)
+from app.features.storage.presigner import LocalPresigner
 from app.features.storage.repository import StorageRepository
 from app.features.storage.schemas import PresignUploadRes, PresignDownloadRes
 
@@ -13,18 +21,67 @@ from app.features.storage.schemas import PresignUploadRes, PresignDownloadRes
 MAX_BACKUPS = 3  # Cleanup triggers when user has this many or more
 KEEP_BACKUPS = 2  # Number of backups to keep after cleanup
 
+# Backup names start with their upload timestamp, so they sort on a fixed-length
+# prefix: a legacy timestamp with microseconds ("2025-01-26T12-30-45.123456")
+# is this long, and a compact one ("20250126T123045") is shorter and followed
+# by its random suffix, which only orders uploads within the same second
+BACKUP_SORT_PREFIX_LEN = 26
+
+# Extracts the token query parameter from a signed upload URL
+_TOKEN_RE = re.compile(r"[?&]token=([^&#]+)")
+
+# Per-user backup counts let uploads skip the listing while the user is
+# below MAX_BACKUPS; entries are refreshed from a real listing after the TTL
+BACKUP_COUNT_CACHE_MAXSIZE = 10_000
+BACKUP_COUNT_CACHE_TTL = 60  # Seconds
+
+# Cleanup first reads this many of the newest files, with headroom for
+# latest.json and stray files; a full page falls back to a complete listing
+CLEANUP_LIST_LIMIT = MAX_BACKUPS + 3
+
+# References to fire-and-forget cleanup tasks so they are not garbage
+# collected before they finish
+_background_tasks: Set["asyncio.Task[int]"] = set()
+
+
+def _backup_sort_key(file_obj: Dict[str, Any]) -> str:
+    """
+    Sort key ordering backup files oldest first.
+
+    Filename format: {timestamp}-{random-hex}.db.enc
+    Example: 20250126T123045-a1b2.db.enc
+    Legacy example: 2025-01-26T12-30-45.123456+00-00-a1b2c3d4.db.enc
+
+    Legacy names sort before compact ones, matching their upload order.
+    """
+    name: str = file_obj.get("name", "")
+    return name[:BACKUP_SORT_PREFIX_LEN]
+
 
 class StorageService:
     """Service for storage operations with business logic."""
 
-    def __init__(self, repository: StorageRepository) -> None:
+    def __init__(
+        self,
+        repository: StorageRepository,
+        presigner: Optional[LocalPresigner] = None,
+    ) -> None:
         """
         Initialize storage service.
 
         Args:
             repository: StorageRepository instance
+            presigner: Signs URLs locally when set; otherwise Supabase signs them
         """
         self.repository = repository
+        self.presigner = presigner
+        self._backup_counts: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    def _set_backup_count(self, user_id: str, count: int, expires_at: float) -> None:
+        self._backup_counts[user_id] = (count, expires_at)
+        self._backup_counts.move_to_end(user_id)
+        if len(self._backup_counts) > BACKUP_COUNT_CACHE_MAXSIZE:
+            self._backup_counts.popitem(last=False)
 
     def build_backup_paths(self, user_id: str, filename: str) -> Tuple[str, str]:
         """
@@ -40,11 +97,12 @@ class StorageService:
         # Sanitize filename - replace slashes with underscores
         safe_filename = filename.replace("/", "_")
 
-        # Generate ISO timestamp with colons replaced by hyphens
-        timestamp = datetime.now(timezone.utc).isoformat().replace(":", "-")
+        # Generate compact UTC timestamp with second resolution
+        timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
 
-        # Generate random hex string (4 bytes = 8 hex characters)
-        random_hex = secrets.token_hex(4)
+        # Generate random hex string (2 bytes = 4 hex characters); only a few
+        # backups coexist per user, so this only has to separate same-second uploads
+        random_hex = os.urandom(2).hex()
 
         # Build data path
         if safe_filename.endswith(".db.enc"):
@@ -67,48 +125,25 @@ class StorageService:
             user_id: Expected user ID
 
         Raises:
-            HTTPException: 403 if path doesn't belong to user
+            HTTPException: 403 if path doesn't belong to user or climbs out of
+                the user's folder with a ".." segment
         """
-        expected_prefix = f"{user_id}/"
-        if not path.startswith(expected_prefix):
+        # Compare without building the prefix string; it is only needed on failure
+        if not (
+            path.startswith(user_id) and path[len(user_id) : len(user_id) + 1] == "/"
+        ) or ("/.." in path and ("/../" in path or path.endswith("/.."))):
+            expected_prefix = f"{user_id}/"
             logger.warning(
-                f"Path validation failed - user_id: {user_id}, path: {path}, expected prefix: {expected_prefix}"
+                "Path validation failed - user_id: %s, path: %s, expected prefix: %s",
+                user_id,
+                path,
+                expected_prefix,
             )
             raise HTTPException(
                 status_code=403,
                 detail=f"Path must start with {expected_prefix}",
             )
 
-    def _sort_backups_by_timestamp(
-        self, backup_files: List[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
-        """
-        Sort backup files by timestamp extracted from filename.
-
-        Args:
-            backup_files: List of file objects with 'name' field
-
-        Returns:
-            List sorted by timestamp (oldest first)
-
-        Filename format: {ISO-timestamp}-{random-hex}.db.enc
-        Example: 2025-01-26T12-30-45.123456+00-00-a1b2c3d4.db.enc
-        """
-
-        def extract_timestamp(file_obj: Dict[str, Any]) -> str:
-            name = file_obj.get("name", "")
-            try:
-                # Remove .db.enc suffix and the random hex (last 8 chars after hyphen)
-                base = name.rsplit(".db.enc", 1)[0]
-                parts = base.rsplit("-", 1)
-                if len(parts) == 2 and len(parts[1]) == 8:
-                    return parts[0]
-                return base
-            except Exception:
-                return name
-
-        return sorted(backup_files, key=extract_timestamp)
-
     async def cleanup_old_backups(
         self, user_id: str, user_token: Optional[str] = None
     ) -> int:
@@ -126,10 +161,27 @@ class StorageService:
         Note:
             This method catches all exceptions and logs them.
             It never raises exceptions to ensure the presign_upload flow continues.
+            Counts are cached per user, counting the upload being signed, so
+            users below MAX_BACKUPS skip the listing until the entry expires.
         """
+        now = time.monotonic()
+        cached = self._backup_counts.get(user_id)
+        if cached is not None and cached[1] > now and cached[0] < MAX_BACKUPS:
+            self._set_backup_count(user_id, cached[0] + 1, cached[1])
+            logger.debug(
+                "User %s has %s cached backups, no cleanup needed",
+                user_id,
+                cached[0],
+            )
+            return 0
+
         try:
-            # List all files in user's directory
-            files = self.repository.list_user_files(user_id, user_token)
+            # List the newest files, then everything if that page was full
+            files = await self.repository.list_user_files(
+                user_id, user_token, limit=CLEANUP_LIST_LIMIT
+            )
+            if len(files) >= CLEANUP_LIST_LIMIT:
+                files = await self.repository.list_user_files(user_id, user_token)
 
             # Filter to only .db.enc files (exclude latest.json and other files)
             backup_files = [
@@ -138,32 +190,41 @@ class StorageService:
 
             # Check if cleanup is needed
             if len(backup_files) < MAX_BACKUPS:
+                self._set_backup_count(
+                    user_id, len(backup_files) + 1, now + BACKUP_COUNT_CACHE_TTL
+                )
                 logger.debug(
-                    f"User {user_id} has {len(backup_files)} backups, no cleanup needed"
+                    "User %s has %s backups, no cleanup needed",
+                    user_id,
+                    len(backup_files),
                 )
                 return 0
 
-            # Sort by timestamp (oldest first)
-            sorted_backups = self._sort_backups_by_timestamp(backup_files)
-
-            # Determine files to delete (all except the KEEP_BACKUPS most recent)
-            files_to_delete = sorted_backups[:-KEEP_BACKUPS]
+            # Sort by timestamp (oldest first), in place since the filtered list
+            # is our own
+            backup_files.sort(key=_backup_sort_key)
 
-            # Build full paths and delete
+            # Build full paths of all except the KEEP_BACKUPS most recent
             paths_to_delete = [
-                f"{user_id}/{f.get('name')}" for f in files_to_delete
+                f"{user_id}/{f['name']}" for f in backup_files[:-KEEP_BACKUPS]
             ]
 
             logger.info(
-                f"Cleaning up {len(paths_to_delete)} old backups for user {user_id}"
+                "Cleaning up %s old backups for user %s",
+                len(paths_to_delete),
+                user_id,
+            )
+            await self.repository.delete_files(paths_to_delete, user_token)
+            self._set_backup_count(
+                user_id, KEEP_BACKUPS + 1, now + BACKUP_COUNT_CACHE_TTL
             )
-            self.repository.delete_files(paths_to_delete, user_token)
 
             return len(paths_to_delete)
 
         except Exception as e:
+            self._backup_counts.pop(user_id, None)
             # Log error but don't fail the presign_upload request
-            logger.error(f"Failed to cleanup old backups for user {user_id}: {str(e)}")
+            logger.error("Failed to cleanup old backups for user %s: %s", user_id, e)
             return 0
 
     async def presign_upload(
@@ -186,37 +247,53 @@ class StorageService:
         # Validate filename doesn't contain slashes
         if "/" in filename:
             logger.warning(
-                f"Invalid filename - user_id: {user_id}, filename: {filename} (contains slashes)"
+                "Invalid filename - user_id: %s, filename: %s (contains slashes)",
+                user_id,
+                filename,
             )
             raise HTTPException(
                 status_code=400, detail="Filename cannot contain slashes"
             )
 
-        # Clean up old backups before creating new one
-        deleted_count = await self.cleanup_old_backups(user_id, user_token)
-        if deleted_count > 0:
-            logger.info(f"Cleaned up {deleted_count} old backups for user {user_id}")
+        # Clean up old backups in the background; signing does not depend on
+        # it and cleanup never raises
+        task = asyncio.create_task(self.cleanup_old_backups(user_id, user_token))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
         # Build paths
         data_path, latest_path = self.build_backup_paths(user_id, filename)
         logger.debug(
-            f"Built backup paths - user_id: {user_id}, data_path: {data_path}, latest_path: {latest_path}"
+            "Built backup paths - user_id: %s, data_path: %s, latest_path: %s",
+            user_id,
+            data_path,
+            latest_path,
         )
 
         try:
             # Create signed upload URLs
             logger.debug(
-                f"Creating signed upload URLs - user_id: {user_id}, data_path: {data_path}"
-            )
-            upload_result = self.repository.create_signed_upload_url(
-                data_path, user_token
-            )
-            latest_result = self.repository.create_signed_upload_url(
-                latest_path, user_token
+                "Creating signed upload URLs - user_id: %s, data_path: %s",
+                user_id,
+                data_path,
             )
+            if self.presigner is not None:
+                upload_result = self.presigner.create_signed_upload_url(
+                    data_path, user_id
+                )
+                latest_result = self.presigner.create_signed_upload_url(
+                    latest_path, user_id, upsert=True
+                )
+            else:
+                # Both URLs are independent, so sign them concurrently
+                upload_result, latest_result = await asyncio.gather(
+                    self.repository.create_signed_upload_url(data_path, user_token),
+                    self.repository.create_signed_upload_url(latest_path, user_token),
+                )
 
             logger.debug(
-                f"Signed upload URLs created successfully - user_id: {user_id}"
+                "Signed upload URLs created successfully - user_id: %s",
+                user_id,
             )
 
             upload_token = self._extract_upload_token(upload_result)
@@ -231,7 +308,10 @@ class StorageService:
 
         except Exception as e:
             logger.error(
-                f"Failed to create upload tokens - user_id: {user_id}, filename: {filename}, error: {str(e)}"
+                "Failed to create upload tokens - user_id: %s, filename: %s, error: %s",
+                user_id,
+                filename,
+                e,
             )
             raise HTTPException(
                 status_code=500,
@@ -254,7 +334,8 @@ class StorageService:
             PresignDownloadRes with signed URL
 
         Raises:
-            HTTPException: 403 if path doesn't belong to user, 500 if Supabase fails
+            HTTPException: 403 if path doesn't belong to user, 404 if the object
+                does not exist, 500 if Supabase fails
         """
         # Validate path belongs to user
         self.validate_download_path(path, user_id)
@@ -262,20 +343,42 @@ class StorageService:
         try:
             # Create signed download URL
             logger.debug(
-                f"Creating signed download URL - user_id: {user_id}, path: {path}, seconds: {seconds}"
-            )
-            result = self.repository.create_signed_download_url(
-                path, seconds, user_token
+                "Creating signed download URL - user_id: %s, path: %s, seconds: %s",
+                user_id,
+                path,
+                seconds,
             )
+            if self.presigner is not None:
+                result = self.presigner.create_signed_download_url(path, seconds)
+            else:
+                result = await self.repository.create_signed_download_url(
+                    path, seconds, user_token
+                )
             logger.debug(
-                f"Signed download URL created successfully - user_id: {user_id}, path: {path}"
+                "Signed download URL created successfully - user_id: %s, path: %s",
+                user_id,
+                path,
             )
 
-            return PresignDownloadRes(url=result["signedURL"])
+            signed_url = result["signedURL"]
+            if not signed_url:
+                raise StorageError(f"No signed URL returned for path: {path}")
+
+            return PresignDownloadRes(url=signed_url)
 
+        except StorageNotFoundError as e:
+            logger.warning(
+                "Download target not found - user_id: %s, path: %s",
+                user_id,
+                path,
+            )
+            raise HTTPException(status_code=404, detail=str(e))
         except Exception as e:
             logger.error(
-                f"Failed to create download URL - user_id: {user_id}, path: {path}, error: {str(e)}"
+                "Failed to create download URL - user_id: %s, path: %s, error: %s",
+                user_id,
+                path,
+                e,
             )
             raise HTTPException(
                 status_code=500,
@@ -283,8 +386,8 @@ class StorageService:
             )
 
     @staticmethod
-    def _extract_upload_token(result: dict) -> Optional[str]:
-        if not isinstance(result, dict):
+    def _extract_upload_token(result: Optional[Mapping[str, Any]]) -> Optional[str]:
+        if not isinstance(result, Mapping):
             return None
         if "token" in result:
             value = result.get("token")
@@ -292,6 +395,5 @@ class StorageService:
         signed_url = result.get("signed_url") or result.get("signedURL")
         if not signed_url:
             return None
-        parsed = urlparse(signed_url)
-        tokens = parse_qs(parsed.query).get("token")
-        return tokens[0] if tokens else None
+        match = _TOKEN_RE.search(signed_url)
+        return unquote(match.group(1)) if match else None
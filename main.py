@@ -1,22 +1,41 @@
 """FastAPI application entry point."""
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
-from dotenv import load_dotenv
 import os
 
-# Load environment variables from .env file
-load_dotenv()
-
-from app.core.logger import logger  # noqa: E402
+# Load environment variables from .env file (parsed once, by app.core.config)
+from app.core import config  # noqa: F401
+from app.core.logger import logger
+from app.core.supabase import (
+    close_async_supabase_client,
+    get_async_supabase_client,
+)
 
 # Import and register feature routers
-from app.features.storage.routes import router as storage_router  # noqa: E402
+from app.features.storage.routes import router as storage_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create the shared async Supabase client on startup, close it on shutdown."""
+    try:
+        await get_async_supabase_client()
+    except ValueError as e:
+        # Missing configuration; the client is created on first use instead
+        logger.warning("Supabase client not initialized at startup: %s", e)
+    yield
+    await close_async_supabase_client()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Wallyo Server",
     description="Backup Storage API for encrypted SQLite backups",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Log application startup
@@ -1,99 +1,237 @@
 """Tests for JWT authentication."""
 
+import time
+from typing import Iterator
+
+import jwt
 import pytest
-from unittest.mock import Mock, patch, AsyncMock
-from fastapi import HTTPException
+from unittest.mock import Mock, patch
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core import auth
+from app.core.auth import get_user_id, get_user_token
+
+USER_ID = "123e4567-e89b-12d3-a456-426614174000"
+JWT_SECRET = "test-jwt-secret"
+
+
+def make_token(exp_in: int = 3600, secret: str = JWT_SECRET) -> str:
+    """Build a JWT shaped like a Supabase access token."""
+    return jwt.encode(
+        {"sub": USER_ID, "aud": "authenticated", "exp": int(time.time()) + exp_in},
+        secret,
+        algorithm="HS256",
+    )
 
-from app.core.auth import get_user_id
+
+def make_client(user_id: str = USER_ID) -> Mock:
+    """Build a Supabase client mock whose get_user returns the given user."""
+    mock_user = Mock()
+    mock_user.id = user_id
+
+    mock_response = Mock()
+    mock_response.user = mock_user
+
+    mock_client = Mock()
+    mock_client.auth.get_user.return_value = mock_response
+    return mock_client
 
 
 class TestGetUserId:
     """Test get_user_id dependency function."""
 
-    @pytest.mark.asyncio
-    async def test_get_user_id_with_valid_token(self) -> None:
+    @pytest.fixture(autouse=True)
+    def clear_token_cache(self) -> Iterator[None]:
+        """Isolate tests from each other's cached tokens."""
+        auth._token_cache.clear()
+        yield
+        auth._token_cache.clear()
+
+    @pytest.fixture(autouse=True)
+    def mock_settings(self) -> Iterator[Mock]:
+        """Provide settings without a JWT secret (network validation)."""
+        settings = Mock()
+        settings.supabase_jwt_secret = None
+        with patch("app.core.auth.get_settings", return_value=settings):
+            yield settings
+
+    def test_get_user_id_with_valid_token(self) -> None:
         """Test that valid JWT returns user ID."""
-        mock_user = Mock()
-        mock_user.id = "123e4567-e89b-12d3-a456-426614174000"
-
-        mock_response = Mock()
-        mock_response.user = mock_user
-
-        mock_auth = Mock()
-        mock_auth.set_session = Mock()
-        mock_auth.get_user.return_value = mock_response
+        mock_client = make_client()
+        token = make_token()
 
-        mock_client = Mock()
-        mock_client.auth = mock_auth
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            user_id = get_user_id(token)
 
-        with patch("app.core.auth.create_client", return_value=mock_client):
-            user_id = await get_user_id("Bearer valid-token")
+        assert user_id == USER_ID
+        mock_client.auth.get_user.assert_called_once_with(token)
 
-            assert user_id == "123e4567-e89b-12d3-a456-426614174000"
-            mock_auth.set_session.assert_called_once_with(
-                access_token="valid-token", refresh_token=""
-            )
-            mock_auth.get_user.assert_called_once()
+    def test_get_user_id_with_invalid_token(self) -> None:
+        """Test that invalid token raises 401."""
+        mock_client = make_client()
+        mock_client.auth.get_user.return_value.user = None
 
-    @pytest.mark.asyncio
-    async def test_get_user_id_with_missing_header(self) -> None:
-        """Test that missing authorization header raises 401."""
-        with pytest.raises(HTTPException) as exc_info:
-            await get_user_id(None)
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            with pytest.raises(HTTPException) as exc_info:
+                get_user_id(make_token())
 
         assert exc_info.value.status_code == 401
-        assert "Missing or invalid authorization header" in exc_info.value.detail
+        assert "Invalid token" in exc_info.value.detail
 
-    @pytest.mark.asyncio
-    async def test_get_user_id_with_invalid_header_format(self) -> None:
-        """Test that invalid header format raises 401."""
-        with pytest.raises(HTTPException) as exc_info:
-            await get_user_id("InvalidFormat token")
+    def test_get_user_id_with_exception_from_supabase(self) -> None:
+        """Test that Supabase client exceptions are handled."""
+        mock_client = Mock()
+        mock_client.auth.get_user.side_effect = Exception("Connection error")
+
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            with pytest.raises(HTTPException) as exc_info:
+                get_user_id(make_token())
 
         assert exc_info.value.status_code == 401
+        assert "Invalid token" in exc_info.value.detail
 
-    @pytest.mark.asyncio
-    async def test_get_user_id_with_empty_bearer(self) -> None:
-        """Test that empty bearer token raises 401."""
-        with pytest.raises(HTTPException) as exc_info:
-            await get_user_id("Bearer ")
+    @pytest.mark.parametrize(
+        "token", ["garbage", "a" * 64, "a.b.c", "x" * 40 + ".y.z.w"]
+    )
+    def test_get_user_id_rejects_malformed_token(self, token: str) -> None:
+        """Test that malformed tokens are rejected without a Supabase call."""
+        mock_client = make_client()
 
-        assert exc_info.value.status_code == 401
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            with pytest.raises(HTTPException) as exc_info:
+                get_user_id(token)
 
-    @pytest.mark.asyncio
-    async def test_get_user_id_with_invalid_token(self) -> None:
-        """Test that invalid token raises 401."""
-        mock_response = Mock()
-        mock_response.user = None
+        assert exc_info.value.status_code == 401
+        mock_client.auth.get_user.assert_not_called()
+
+    def test_get_user_id_caches_validated_token(self) -> None:
+        """Test that a repeated token skips the Supabase round-trip."""
+        mock_client = make_client()
+        token = make_token()
 
-        mock_auth = Mock()
-        mock_auth.set_session = Mock()
-        mock_auth.get_user.return_value = mock_response
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            assert get_user_id(token) == USER_ID
+            assert get_user_id(token) == USER_ID
 
-        mock_client = Mock()
-        mock_client.auth = mock_auth
+        mock_client.auth.get_user.assert_called_once_with(token)
+
+    def test_get_user_id_does_not_cache_raw_token(self) -> None:
+        """Test that cache keys are token digests, not the token itself."""
+        mock_client = make_client()
+        token = make_token()
+
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            get_user_id(token)
+
+        assert token not in auth._token_cache
+        assert all(isinstance(key, bytes) for key in auth._token_cache)
+
+    def test_get_user_id_revalidates_expired_token(self) -> None:
+        """Test that entries are not served past the token's exp claim."""
+        mock_client = make_client()
+        token = make_token(exp_in=-1)
+
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            get_user_id(token)
+            get_user_id(token)
+
+        assert mock_client.auth.get_user.call_count == 2
+
+    def test_get_user_id_does_not_cache_failed_validation(self) -> None:
+        """Test that rejected tokens are validated again on the next request."""
+        mock_client = make_client()
+        mock_client.auth.get_user.return_value.user = None
+        token = make_token()
+
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            for _ in range(2):
+                with pytest.raises(HTTPException):
+                    get_user_id(token)
+
+        assert mock_client.auth.get_user.call_count == 2
+
+    def test_header_parsed_once_per_request(self) -> None:
+        """Test that routes injecting user ID and token share one parse."""
+        app = FastAPI()
+
+        @app.get("/whoami")
+        def whoami(
+            user_id: str = Depends(get_user_id),
+            user_token: str = Depends(get_user_token),
+        ) -> dict:
+            return {"user_id": user_id}
+
+        mock_client = make_client()
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            with patch(
+                "app.core.auth._extract_bearer", wraps=auth._extract_bearer
+            ) as mock_extract:
+                response = TestClient(app).get(
+                    "/whoami", headers={"Authorization": f"Bearer {make_token()}"}
+                )
+
+        assert response.status_code == 200
+        assert response.json() == {"user_id": USER_ID}
+        mock_extract.assert_called_once()
+
+    def test_get_user_id_verifies_locally_with_jwt_secret(
+        self, mock_settings: Mock
+    ) -> None:
+        """Test that a configured JWT secret avoids the Supabase call."""
+        mock_settings.supabase_jwt_secret = JWT_SECRET
+        mock_client = make_client()
+
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            user_id = get_user_id(make_token())
+
+        assert user_id == USER_ID
+        mock_client.auth.get_user.assert_not_called()
+
+    def test_get_user_id_falls_back_to_supabase_on_bad_signature(
+        self, mock_settings: Mock
+    ) -> None:
+        """Test that tokens failing local verification are checked remotely."""
+        mock_settings.supabase_jwt_secret = JWT_SECRET
+        mock_client = make_client()
+        token = make_token(secret="rotated-secret")
+
+        with patch("app.core.auth.get_supabase_client", return_value=mock_client):
+            user_id = get_user_id(token)
+
+        assert user_id == USER_ID
+        mock_client.auth.get_user.assert_called_once_with(token)
+
+
+class TestGetUserToken:
+    """Test get_user_token dependency function."""
+
+    def test_get_user_token_returns_token(self) -> None:
+        """Test that the token is returned without the scheme prefix."""
+        assert get_user_token("Bearer abc.def.ghi") == "abc.def.ghi"
 
-        with patch("app.core.auth.create_client", return_value=mock_client):
-            with pytest.raises(HTTPException) as exc_info:
-                await get_user_id("Bearer invalid-token")
+    def test_get_user_token_scheme_is_case_insensitive(self) -> None:
+        """Test that the Bearer scheme matches regardless of case."""
+        assert get_user_token("bEaReR abc.def.ghi") == "abc.def.ghi"
 
-            assert exc_info.value.status_code == 401
-            assert "Invalid token" in exc_info.value.detail
+    def test_get_user_token_with_invalid_header_format(self) -> None:
+        """Test that non-Bearer schemes raise 401."""
+        with pytest.raises(HTTPException) as exc_info:
+            get_user_token("Basic dXNlcjpwYXNz")
 
-    @pytest.mark.asyncio
-    async def test_get_user_id_with_exception_from_supabase(self) -> None:
-        """Test that Supabase client exceptions are handled."""
-        mock_auth = Mock()
-        mock_auth.set_session = Mock()
-        mock_auth.get_user.side_effect = Exception("Connection error")
+        assert exc_info.value.status_code == 401
 
-        mock_client = Mock()
-        mock_client.auth = mock_auth
+    def test_get_user_token_with_missing_header(self) -> None:
+        """Test that missing authorization header raises 401."""
+        with pytest.raises(HTTPException) as exc_info:
+            get_user_token(None)
 
-        with patch("app.core.auth.create_client", return_value=mock_client):
-            with pytest.raises(HTTPException) as exc_info:
-                await get_user_id("Bearer token")
+        assert exc_info.value.status_code == 401
+        assert "Missing authorization header" in exc_info.value.detail
 
-            assert exc_info.value.status_code == 401
-            assert "Token validation failed" in exc_info.value.detail
+    def test_get_user_token_with_empty_bearer(self) -> None:
+        """Test that empty bearer token raises 401."""
+        with pytest.raises(HTTPException) as exc_info:
+            get_user_token("Bearer ")
 
+        assert exc_info.value.status_code == 401
@@ -0,0 +1,35 @@
+"""Tests for Supabase client setup."""
+
+import pytest
+
+from app.core import supabase
+from app.core.supabase import close_async_supabase_client, get_async_http_client
+
+
+class TestAsyncHttpClient:
+    """Test the shared async connection pool."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_pool(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Start each test without a pool or async client."""
+        monkeypatch.setattr(supabase, "_async_http_client", None)
+        monkeypatch.setattr(supabase, "_async_supabase_client", None)
+
+    async def test_pool_is_shared_across_calls(self) -> None:
+        """Test that repeated requests reuse one connection pool."""
+        pools = {id(get_async_http_client()) for _ in range(50)}
+
+        assert len(pools) == 1
+        await close_async_supabase_client()
+
+    async def test_close_releases_pool(self) -> None:
+        """Test that shutdown closes the pool and the next call builds a new one."""
+        pool = get_async_http_client()
+
+        await close_async_supabase_client()
+
+        assert pool.is_closed
+        assert supabase._async_http_client is None
+        new_pool = get_async_http_client()
+        assert new_pool is not pool
+        await close_async_supabase_client()
@@ -0,0 +1,83 @@
+"""Shared fixtures for storage tests."""
+
+from collections import OrderedDict
+from typing import Iterator, Tuple
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.auth import get_user_id
+from app.features.storage import repository
+from app.features.storage.repository import StorageRepository
+from app.features.storage.routes import router
+
+USER_ID = "123e4567-e89b-12d3-a456-426614174000"
+
+
+@pytest.fixture(scope="session")
+def app() -> FastAPI:
+    """Build one app serving the storage routes for the whole session."""
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app: FastAPI) -> Iterator[TestClient]:
+    """Create one test client for the whole session."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def authenticated(app: FastAPI) -> Iterator[str]:
+    """Resolve the caller as USER_ID without validating the bearer token."""
+    app.dependency_overrides[get_user_id] = lambda: USER_ID
+    yield USER_ID
+    app.dependency_overrides.pop(get_user_id, None)
+
+
+@pytest.fixture(scope="module")
+def mocked_supabase() -> Mock:
+    """Build the mocked service client and its bucket once per module."""
+    mock_supabase = Mock()
+    mock_supabase.storage.from_.return_value = AsyncMock()
+    return mock_supabase
+
+
+@pytest.fixture(autouse=True)
+def supabase_mock(mocked_supabase: Mock, monkeypatch: pytest.MonkeyPatch) -> Mock:
+    """
+    Serve every storage test's service client from the shared mock.
+
+    No test reaches Supabase by default. Call history and anything a
+    previous test configured on the bucket are reset first.
+
+    Returns:
+        Mock Supabase client whose storage.from_() returns the mock bucket
+    """
+    mock_bucket = mocked_supabase.storage.from_.return_value
+    mocked_supabase.reset_mock()
+    mock_bucket.reset_mock(return_value=True, side_effect=True)
+    monkeypatch.setattr(
+        repository,
+        "get_async_supabase_client",
+        AsyncMock(return_value=mocked_supabase),
+    )
+    # Start from an empty signed URL cache so results are not shared by tests
+    monkeypatch.setattr(repository, "_signed_urls", OrderedDict())
+    return mocked_supabase
+
+
+@pytest.fixture
+def storage_repo(supabase_mock: Mock) -> Tuple[StorageRepository, AsyncMock, Mock]:
+    """
+    Build a repository on the mocked service client.
+
+    Returns:
+        Tuple of (repository for "test-bucket", mock bucket, mock Supabase client)
+    """
+    mock_bucket = supabase_mock.storage.from_.return_value
+    return StorageRepository(bucket_name="test-bucket"), mock_bucket, supabase_mock
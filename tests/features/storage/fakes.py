@@ -0,0 +1,40 @@
+"""Hand-written fakes for storage tests."""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class FakeStorageRepository:
+    """
+    In-memory stand-in for StorageRepository with preset results.
+
+    Cheaper than a spec'd Mock for tests that only need canned responses.
+    Calls are recorded in order as (method, argument) tuples.
+    """
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[str, Any]] = []
+        self.upload_urls: Deque[Dict[str, Any]] = deque()
+        self.list_result: List[Dict[str, Any]] = []
+        self.delete_result: List[Dict[str, Any]] = []
+
+    async def create_signed_upload_url(
+        self, path: str, user_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        self.calls.append(("upload", path))
+        return self.upload_urls.popleft()
+
+    async def list_user_files(
+        self,
+        user_id: str,
+        user_token: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        self.calls.append(("list", user_id))
+        return self.list_result
+
+    async def delete_files(
+        self, paths: List[str], user_token: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        self.calls.append(("delete", paths))
+        return self.delete_result
@@ -0,0 +1,104 @@
+"""Tests for local storage URL signing."""
+
+from urllib.parse import parse_qs, urlparse
+
+import jwt
+import pytest
+from unittest.mock import Mock
+
+from app.features.storage import presigner as presigner_module
+from app.features.storage.presigner import (
+    SIGNED_UPLOAD_URL_TTL,
+    LocalPresigner,
+    create_local_presigner,
+)
+
+JWT_SECRET = "test-jwt-secret"
+USER_ID = "123e4567-e89b-12d3-a456-426614174000"
+
+
+def decode(token: str) -> dict:
+    """Decode a storage token with the test secret."""
+    return jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+
+
+class TestLocalPresigner:
+    """Test LocalPresigner class."""
+
+    @pytest.fixture
+    def presigner(self) -> LocalPresigner:
+        """Create a presigner for a test project."""
+        return LocalPresigner(JWT_SECRET, "https://proj.supabase.co/", "user-backups")
+
+    def test_upload_token_claims(self, presigner: LocalPresigner) -> None:
+        """Test that upload tokens carry the object URL, owner and upsert flag."""
+        result = presigner.create_signed_upload_url(
+            f"{USER_ID}/latest.json", USER_ID, upsert=True
+        )
+
+        claims = decode(result["token"])
+        assert claims["url"] == f"user-backups/{USER_ID}/latest.json"
+        assert claims["owner"] == USER_ID
+        assert claims["upsert"] is True
+        assert claims["exp"] - claims["iat"] == SIGNED_UPLOAD_URL_TTL
+        assert result["path"] == f"{USER_ID}/latest.json"
+
+    def test_upload_url_embeds_token(self, presigner: LocalPresigner) -> None:
+        """Test that the signed upload URL targets the storage upload endpoint."""
+        result = presigner.create_signed_upload_url(f"{USER_ID}/backup.db.enc", USER_ID)
+
+        parsed = urlparse(result["signed_url"])
+        assert parsed.netloc == "proj.supabase.co"
+        assert (
+            parsed.path
+            == f"/storage/v1/object/upload/sign/user-backups/{USER_ID}/backup.db.enc"
+        )
+        assert parse_qs(parsed.query)["token"] == [result["token"]]
+        assert decode(result["token"])["upsert"] is False
+
+    def test_download_url(self, presigner: LocalPresigner) -> None:
+        """Test that download URLs are signed for the requested duration."""
+        result = presigner.create_signed_download_url(f"{USER_ID}/latest.json", 120)
+
+        parsed = urlparse(result["signedURL"])
+        assert (
+            parsed.path == f"/storage/v1/object/sign/user-backups/{USER_ID}/latest.json"
+        )
+        claims = decode(parse_qs(parsed.query)["token"][0])
+        assert claims["url"] == f"user-backups/{USER_ID}/latest.json"
+        assert claims["exp"] - claims["iat"] == 120
+
+    def test_tokens_match_pyjwt_encoding(self, presigner: LocalPresigner) -> None:
+        """Test that the pre-keyed signer produces standard HS256 JWTs."""
+        token = presigner.create_signed_upload_url(f"{USER_ID}/a.db.enc", USER_ID)[
+            "token"
+        ]
+
+        assert token == jwt.encode(decode(token), JWT_SECRET, algorithm="HS256")
+
+
+class TestCreateLocalPresigner:
+    """Test create_local_presigner function."""
+
+    @pytest.fixture
+    def mock_settings(self, monkeypatch: pytest.MonkeyPatch) -> Mock:
+        """Provide settings for a test project."""
+        settings = Mock()
+        settings.supabase_jwt_secret = JWT_SECRET
+        settings.supabase_url = "https://proj.supabase.co"
+        settings.bucket = "user-backups"
+        monkeypatch.setattr(presigner_module, "get_settings", lambda: settings)
+        return settings
+
+    def test_builds_presigner_with_jwt_secret(self, mock_settings: Mock) -> None:
+        """Test that a configured JWT secret enables local signing."""
+        presigner = create_local_presigner()
+
+        assert isinstance(presigner, LocalPresigner)
+        assert presigner.bucket_name == "user-backups"
+
+    def test_returns_none_without_jwt_secret(self, mock_settings: Mock) -> None:
+        """Test that Supabase keeps signing URLs when no secret is set."""
+        mock_settings.supabase_jwt_secret = None
+
+        assert create_local_presigner() is None
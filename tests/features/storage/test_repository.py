@@ -1,240 +1,689 @@
 """Tests for storage repository."""
 
-import pytest
-from unittest.mock import Mock, patch
+import re
+import time
+from typing import Any, Dict, Iterator, Optional, Pattern, Tuple, Union
 
-from app.features.storage.repository import StorageRepository
+import jwt
+import pytest
+from unittest.mock import ANY, AsyncMock, Mock, call
+from storage3.exceptions import StorageApiError
+from supabase import StorageException
+
+from app.core.auth import token_digest
+from app.features.storage import repository
+from app.features.storage.exceptions.storage_bucket_missing_error import (
+    StorageBucketMissingError,
+)
+from app.features.storage.exceptions.storage_error import StorageError
+from app.features.storage.exceptions.storage_not_found_error import (
+    StorageNotFoundError,
+)
+from app.features.storage.exceptions.storage_rls_violation_error import (
+    StorageRLSViolationError,
+)
+from app.features.storage.repository import (
+    DELETE_BATCH_SIZE,
+    LIST_PAGE_SIZE,
+    NEWEST_FIRST,
+    StorageRepository,
+)
+
+StorageRepo = Tuple[StorageRepository, AsyncMock, Mock]
+
+# Expected error messages, compiled once for pytest.raises(match=...)
+_RX_UPLOAD = re.compile("The resource already exists")
+_RX_DOWNLOAD = re.compile("Error creating signed URL")
+
+# Keep the module on one worker under pytest-xdist --dist loadgroup
+pytestmark = pytest.mark.xdist_group(name="storage-repository")
 
 
 class TestStorageRepository:
     """Test StorageRepository class."""
 
-    def test_create_signed_upload_url_success(self) -> None:
-        """Test successful creation of signed upload URL."""
-        mock_storage = Mock()
-        mock_storage.create_signed_upload_url.return_value = {
-            "data": {"token": "test-token-123"},
-            "error": None,
-        }
-
-        mock_bucket = Mock()
-        mock_bucket.create_signed_upload_url = mock_storage.create_signed_upload_url
-
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
-
-        with patch("app.features.storage.repository.supabase", mock_supabase):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.create_signed_upload_url("backups/user-id/file.db.enc")
-
-            assert result["data"]["token"] == "test-token-123"
-            mock_supabase.storage.from_.assert_called_once_with("test-bucket")
-            mock_storage.create_signed_upload_url.assert_called_once_with(
-                "backups/user-id/file.db.enc"
-            )
-
-    def test_create_signed_upload_url_error(self) -> None:
-        """Test that Supabase errors are raised as exceptions."""
-        mock_storage = Mock()
-        mock_storage.create_signed_upload_url.return_value = {
-            "data": None,
-            "error": {"message": "Permission denied"},
-        }
-
-        mock_bucket = Mock()
-        mock_bucket.create_signed_upload_url = mock_storage.create_signed_upload_url
-
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
-
-        with patch("app.features.storage.repository.supabase", mock_supabase):
-            repo = StorageRepository()
-            with pytest.raises(Exception, match="Error creating upload token"):
-                repo.create_signed_upload_url("backups/user-id/file.db.enc")
-
-    def test_create_signed_download_url_success(self) -> None:
-        """Test successful creation of signed download URL."""
-        mock_storage = Mock()
-        mock_storage.create_signed_url.return_value = {
-            "data": {"signedUrl": "https://signed-url.example.com"},
-            "error": None,
-        }
-
-        mock_bucket = Mock()
-        mock_bucket.create_signed_url = mock_storage.create_signed_url
+    @pytest.mark.parametrize(
+        "response, error",
+        [
+            (
+                {
+                    "signed_url": "https://signed-url.example.com?token=test-token-123",
+                    "token": "test-token-123",
+                    "path": "user-id/file.db.enc",
+                },
+                None,
+            ),
+            (
+                StorageApiError("The resource already exists", "Duplicate", 409),
+                _RX_UPLOAD,
+            ),
+        ],
+        ids=["success", "error"],
+    )
+    async def test_create_signed_upload_url(
+        self,
+        storage_repo: StorageRepo,
+        response: Union[Dict[str, Any], StorageApiError],
+        error: Optional[Pattern[str]],
+    ) -> None:
+        """Test signed upload URLs and Supabase errors raised as exceptions."""
+        repo, mock_bucket, mock_supabase = storage_repo
+        if isinstance(response, StorageApiError):
+            mock_bucket.create_signed_upload_url.side_effect = response
+        else:
+            mock_bucket.create_signed_upload_url.return_value = response
+
+        if error:
+            with pytest.raises(StorageError, match=error):
+                await repo.create_signed_upload_url("user-id/file.db.enc")
+            return
+
+        result = await repo.create_signed_upload_url("user-id/file.db.enc")
+
+        assert result["token"] == "test-token-123"
+        mock_supabase.storage.from_.assert_called_once_with("test-bucket")
+        mock_bucket.create_signed_upload_url.assert_called_once_with(
+            "user-id/file.db.enc"
+        )
+
+    @pytest.mark.parametrize(
+        "response, error",
+        [
+            ({"signedURL": "https://signed-url.example.com"}, None),
+            (
+                StorageApiError("Internal failure", "InternalError", 500),
+                _RX_DOWNLOAD,
+            ),
+        ],
+        ids=["success", "error"],
+    )
+    async def test_create_signed_download_url(
+        self,
+        storage_repo: StorageRepo,
+        response: Union[Dict[str, Any], StorageApiError],
+        error: Optional[Pattern[str]],
+    ) -> None:
+        """Test signed download URLs and Supabase errors raised as exceptions."""
+        repo, mock_bucket, mock_supabase = storage_repo
+        if isinstance(response, StorageApiError):
+            mock_bucket.create_signed_url.side_effect = response
+        else:
+            mock_bucket.create_signed_url.return_value = response
+
+        if error:
+            with pytest.raises(StorageError, match=error):
+                await repo.create_signed_download_url(
+                    "user-id/latest.json", expires_in=900
+                )
+            return
 
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
+        result = await repo.create_signed_download_url(
+            "user-id/latest.json", expires_in=900
+        )
 
-        with patch("app.features.storage.repository.supabase", mock_supabase):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.create_signed_download_url(
-                "backups/user-id/latest.json", expires_in=900
-            )
+        assert result["signedURL"] == "https://signed-url.example.com"
+        mock_supabase.storage.from_.assert_called_once_with("test-bucket")
+        mock_bucket.create_signed_url.assert_called_once_with(
+            path="user-id/latest.json", expires_in=900
+        )
 
-            assert result["data"]["signedUrl"] == "https://signed-url.example.com"
-            mock_supabase.storage.from_.assert_called_once_with("test-bucket")
-            mock_storage.create_signed_url.assert_called_once_with(
-                path="backups/user-id/latest.json", expires_in=900
-            )
+    async def test_repository_uses_default_bucket(
+        self, storage_repo: StorageRepo, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that repository uses default bucket from settings."""
+        _, mock_bucket, mock_supabase = storage_repo
+        mock_bucket.create_signed_upload_url.return_value = {"token": "test-token"}
+        monkeypatch.setattr(
+            repository, "get_settings", Mock(return_value=Mock(bucket="default-bucket"))
+        )
 
-    def test_create_signed_download_url_error(self) -> None:
-        """Test that Supabase errors are raised as exceptions."""
-        mock_storage = Mock()
-        mock_storage.create_signed_url.return_value = {
-            "data": None,
-            "error": {"message": "Object not found"},
-        }
+        repo = StorageRepository()
+        await repo.create_signed_upload_url("user-id/file.db.enc")
 
-        mock_bucket = Mock()
-        mock_bucket.create_signed_url = mock_storage.create_signed_url
+        mock_supabase.storage.from_.assert_called_once_with("default-bucket")
 
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
 
-        with patch("app.features.storage.repository.supabase", mock_supabase):
-            repo = StorageRepository()
-            with pytest.raises(Exception, match="Error creating signed URL"):
-                repo.create_signed_download_url(
-                    "backups/user-id/latest.json", expires_in=900
-                )
+class TestStorageRepositoryBucket:
+    """Tests for bucket name resolution."""
 
-    def test_repository_uses_default_bucket(self) -> None:
-        """Test that repository uses default bucket from settings."""
-        mock_storage = Mock()
-        mock_storage.create_signed_upload_url.return_value = {
-            "data": {"token": "test-token"},
-            "error": None,
-        }
+    @pytest.fixture
+    def mock_settings(self, monkeypatch: pytest.MonkeyPatch) -> Mock:
+        """Patch settings with a default bucket."""
+        mock_settings = Mock(return_value=Mock(bucket="default-bucket"))
+        monkeypatch.setattr(repository, "get_settings", mock_settings)
+        return mock_settings
 
-        mock_bucket = Mock()
-        mock_bucket.create_signed_upload_url = mock_storage.create_signed_upload_url
+    def test_explicit_bucket_name(self, mock_settings: Mock) -> None:
+        """Test that an explicit bucket name skips settings."""
+        repo = StorageRepository(bucket_name="test-bucket")
 
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
+        assert repo.bucket_name == "test-bucket"
+        mock_settings.assert_not_called()
 
-        with patch("app.features.storage.repository.supabase", mock_supabase):
-            with patch("app.features.storage.repository.settings") as mock_settings:
-                mock_settings.bucket = "default-bucket"
-                repo = StorageRepository()
-                repo.create_signed_upload_url("backups/user-id/file.db.enc")
+    def test_bucket_name_from_settings(self, mock_settings: Mock) -> None:
+        """Test that the default bucket is read from settings once."""
+        repo = StorageRepository()
 
-                mock_supabase.storage.from_.assert_called_once_with("default-bucket")
+        assert repo.bucket_name == "default-bucket"
+        assert repo.bucket_name == "default-bucket"
+        mock_settings.assert_called_once_with()
 
 
 class TestStorageRepositoryListFiles:
     """Tests for list_user_files method."""
 
-    def test_list_user_files_success(self) -> None:
+    async def test_list_user_files_success(self, storage_repo: StorageRepo) -> None:
         """Test successful listing of user files."""
-        mock_bucket = Mock()
+        repo, mock_bucket, mock_supabase = storage_repo
         mock_bucket.list.return_value = [
             {"name": "2025-01-25T10-00-00-aabbccdd.db.enc", "id": "1"},
             {"name": "2025-01-26T10-00-00-11223344.db.enc", "id": "2"},
             {"name": "latest.json", "id": "3"},
         ]
 
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
+        result = await repo.list_user_files("user-123")
 
-        with patch(
-            "app.core.supabase.get_supabase_client", return_value=mock_supabase
-        ):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.list_user_files("user-123")
+        assert len(result) == 3
+        assert result[0]["name"] == "2025-01-25T10-00-00-aabbccdd.db.enc"
+        mock_supabase.storage.from_.assert_called_with("test-bucket")
+        mock_bucket.list.assert_called_once_with(
+            path="user-123", options={"limit": LIST_PAGE_SIZE, "offset": 0}
+        )
 
-            assert len(result) == 3
-            assert result[0]["name"] == "2025-01-25T10-00-00-aabbccdd.db.enc"
-            mock_supabase.storage.from_.assert_called_with("test-bucket")
-            mock_bucket.list.assert_called_once_with(path="user-123")
-
-    def test_list_user_files_empty_directory(self) -> None:
+    async def test_list_user_files_empty_directory(
+        self, storage_repo: StorageRepo
+    ) -> None:
         """Test listing when user has no files."""
-        mock_bucket = Mock()
+        repo, mock_bucket, _ = storage_repo
         mock_bucket.list.return_value = []
 
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
-
-        with patch(
-            "app.core.supabase.get_supabase_client", return_value=mock_supabase
-        ):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.list_user_files("user-123")
+        result = await repo.list_user_files("user-123")
 
-            assert result == []
+        assert result == []
 
-    def test_list_user_files_with_user_token(self) -> None:
+    async def test_list_user_files_with_user_token(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
         """Test listing with user token for RLS."""
-        mock_bucket = Mock()
+        mock_bucket = AsyncMock()
         mock_bucket.list.return_value = [{"name": "file.db.enc"}]
 
         mock_user_client = Mock()
-        mock_user_client.storage.from_.return_value = mock_bucket
+        mock_user_client.from_.return_value = mock_bucket
+        monkeypatch.setattr(
+            StorageRepository, "_get_user_client", lambda *a, **kw: mock_user_client
+        )
+
+        repo = StorageRepository(bucket_name="test-bucket")
+        result = await repo.list_user_files("user-123", user_token="jwt-token")
+
+        assert len(result) == 1
+        mock_user_client.from_.assert_called_with("test-bucket")
+
+    async def test_list_user_files_reads_every_page(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that folders larger than one page are listed in full."""
+        repo, mock_bucket, _ = storage_repo
+        first_page = [{"name": f"a-{i}"} for i in range(LIST_PAGE_SIZE)]
+        mock_bucket.list.side_effect = [first_page, [{"name": "b-0"}]]
+
+        result = await repo.list_user_files("user-123")
+
+        assert len(result) == LIST_PAGE_SIZE + 1
+        offsets = [
+            c.kwargs["options"]["offset"] for c in mock_bucket.list.call_args_list
+        ]
+        assert offsets == [0, LIST_PAGE_SIZE]
 
-        with patch.object(
-            StorageRepository, "_get_user_client", return_value=mock_user_client
-        ):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.list_user_files("user-123", user_token="jwt-token")
+    async def test_list_user_files_with_limit_reads_newest_page(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that a limited listing is one newest-first request."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.list.return_value = [{"name": f"f{i}"} for i in range(6)]
 
-            assert len(result) == 1
-            mock_user_client.storage.from_.assert_called_with("test-bucket")
+        result = await repo.list_user_files("user-123", limit=6)
+
+        assert len(result) == 6
+        mock_bucket.list.assert_called_once_with(
+            path="user-123",
+            options={"limit": 6, "offset": 0, "sortBy": NEWEST_FIRST},
+        )
 
 
 class TestStorageRepositoryDeleteFiles:
     """Tests for delete_files method."""
 
-    def test_delete_files_success(self) -> None:
+    async def test_delete_files_success(self, storage_repo: StorageRepo) -> None:
         """Test successful deletion of files."""
-        mock_bucket = Mock()
+        repo, mock_bucket, _ = storage_repo
         mock_bucket.remove.return_value = [
             {"name": "user-123/file1.db.enc"},
             {"name": "user-123/file2.db.enc"},
         ]
 
-        mock_supabase = Mock()
-        mock_supabase.storage.from_.return_value = mock_bucket
-
-        with patch(
-            "app.core.supabase.get_supabase_client", return_value=mock_supabase
-        ):
-            repo = StorageRepository(bucket_name="test-bucket")
-            paths = ["user-123/file1.db.enc", "user-123/file2.db.enc"]
-            result = repo.delete_files(paths)
+        paths = ["user-123/file1.db.enc", "user-123/file2.db.enc"]
+        result = await repo.delete_files(paths)
 
-            assert len(result) == 2
-            mock_bucket.remove.assert_called_once_with(paths)
+        assert len(result) == 2
+        # A single batch is passed through as-is, not copied
+        assert mock_bucket.remove.call_count == 1
+        assert mock_bucket.remove.call_args.args[0] is paths
 
-    def test_delete_files_empty_list(self) -> None:
+    async def test_delete_files_empty_list(self, storage_repo: StorageRepo) -> None:
         """Test that empty list returns early without calling Supabase."""
-        mock_supabase = Mock()
+        repo, _, mock_supabase = storage_repo
 
-        with patch(
-            "app.core.supabase.get_supabase_client", return_value=mock_supabase
-        ):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.delete_files([])
+        result = await repo.delete_files([])
 
-            assert result == []
-            mock_supabase.storage.from_.assert_not_called()
+        assert result == []
+        mock_supabase.storage.from_.assert_not_called()
 
-    def test_delete_files_with_user_token(self) -> None:
+    async def test_delete_files_empty_list_skips_client(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that an empty delete never builds or fetches a client."""
+        mock_get_client = Mock()
+        monkeypatch.setattr(StorageRepository, "_get_client", mock_get_client)
+
+        repo = StorageRepository(bucket_name="test-bucket")
+        result = await repo.delete_files([], user_token="jwt-token")
+
+        assert result == []
+        mock_get_client.assert_not_called()
+
+    async def test_delete_files_with_user_token(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
         """Test deletion with user token for RLS."""
-        mock_bucket = Mock()
+        mock_bucket = AsyncMock()
         mock_bucket.remove.return_value = [{"name": "user-123/file.db.enc"}]
 
         mock_user_client = Mock()
-        mock_user_client.storage.from_.return_value = mock_bucket
-
-        with patch.object(
-            StorageRepository, "_get_user_client", return_value=mock_user_client
-        ):
-            repo = StorageRepository(bucket_name="test-bucket")
-            result = repo.delete_files(
-                ["user-123/file.db.enc"], user_token="jwt-token"
-            )
+        mock_user_client.from_.return_value = mock_bucket
+        monkeypatch.setattr(
+            StorageRepository, "_get_user_client", lambda *a, **kw: mock_user_client
+        )
+
+        repo = StorageRepository(bucket_name="test-bucket")
+        result = await repo.delete_files(
+            ["user-123/file.db.enc"], user_token="jwt-token"
+        )
+
+        assert len(result) == 1
+        mock_user_client.from_.assert_called_with("test-bucket")
+
+    async def test_delete_files_batches_large_lists(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that large deletes are split into batches and merged."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.remove.side_effect = lambda batch: [{"name": p} for p in batch]
+
+        paths = [f"user-123/file{i}.db.enc" for i in range(2 * DELETE_BATCH_SIZE + 20)]
+        result = await repo.delete_files(paths)
+
+        assert [item["name"] for item in result] == paths
+        batch_sizes = [len(call.args[0]) for call in mock_bucket.remove.call_args_list]
+        assert batch_sizes == [DELETE_BATCH_SIZE, DELETE_BATCH_SIZE, 20]
+
+
+class TestStorageRepositoryUserClients:
+    """Tests for per-user client caching."""
+
+    @pytest.fixture(autouse=True)
+    def clear_user_clients(self) -> Iterator[None]:
+        """Isolate tests from each other's cached clients."""
+        repository._user_clients.clear()
+        yield
+        repository._user_clients.clear()
+
+    @pytest.fixture
+    def mock_create(self, monkeypatch: pytest.MonkeyPatch) -> Mock:
+        """Build a fresh mock for every user client the repository creates."""
+        mock_create = Mock(side_effect=lambda t: Mock())
+        monkeypatch.setattr(StorageRepository, "_create_user_client", mock_create)
+        return mock_create
+
+    def test_user_client_reused_for_same_token(self, mock_create: Mock) -> None:
+        """Test that repeated calls with one token build a single client."""
+        repo = StorageRepository(bucket_name="test-bucket")
+        first = repo._get_user_client("jwt-token")
+        second = repo._get_user_client("jwt-token")
+
+        assert first is second
+        mock_create.assert_called_once_with("jwt-token")
+
+    def test_user_client_per_token(self, mock_create: Mock) -> None:
+        """Test that different tokens get different clients."""
+        repo = StorageRepository(bucket_name="test-bucket")
+
+        client_a = repo._get_user_client("token-a")
+        client_b = repo._get_user_client("token-b")
+
+        assert client_a is not client_b
+        # Keyed by token digest, never by the raw token
+        assert set(repository._user_clients) == {
+            token_digest("token-a"),
+            token_digest("token-b"),
+        }
 
-            assert len(result) == 1
-            mock_user_client.storage.from_.assert_called_with("test-bucket")
+    def test_user_client_cache_is_bounded(
+        self, mock_create: Mock, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that least recently used clients are evicted."""
+        monkeypatch.setattr(repository, "USER_CLIENT_CACHE_MAXSIZE", 2)
+
+        repo = StorageRepository(bucket_name="test-bucket")
+        first = repo._get_user_client("token-a")
+        repo._get_user_client("token-b")
+        repo._get_user_client("token-a")  # Mark token-a as recently used
+        repo._get_user_client("token-c")
+
+        assert len(repository._user_clients) == 2
+        assert repo._get_user_client("token-a") is first
+
+    def test_user_client_rebuilt_after_token_expiry(self, mock_create: Mock) -> None:
+        """Test that clients are not reused past the token's exp claim."""
+        expired_token = jwt.encode(
+            {"sub": "user-123", "exp": int(time.time()) - 1}, "secret"
+        )
+        repo = StorageRepository(bucket_name="test-bucket")
+        first = repo._get_user_client(expired_token)
+        second = repo._get_user_client(expired_token)
+
+        assert first is not second
+        assert mock_create.call_count == 2
+
+    def test_user_client_rebuilt_after_pool_closes(
+        self, mock_create: Mock, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that clients bound to a closed pool are not reused."""
+        pools = [Mock(), Mock()]
+        monkeypatch.setattr(repository, "get_async_http_client", lambda: pools[0])
+        repo = StorageRepository(bucket_name="test-bucket")
+        first = repo._get_user_client("jwt-token")
+
+        # close_async_supabase_client() drops the pool; the next call builds one
+        pools.pop(0)
+        second = repo._get_user_client("jwt-token")
+
+        assert first is not second
+        assert repo._get_user_client("jwt-token") is second
+        assert mock_create.call_count == 2
+
+    def test_user_client_sends_token_as_bearer_header(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that user clients authenticate storage calls with the JWT."""
+        settings = Mock()
+        settings.supabase_url = "https://project.supabase.co"
+        settings.supabase_anon_key = "anon-key"
+        shared_pool = Mock()
+        monkeypatch.setattr(repository, "get_settings", lambda: settings)
+        monkeypatch.setattr(repository, "get_async_http_client", lambda: shared_pool)
+
+        client = StorageRepository(bucket_name="test-bucket")._create_user_client(
+            "jwt-token"
+        )
+
+        assert client._client is shared_pool
+        assert client._headers["Authorization"] == "Bearer jwt-token"
+        assert client._headers["apiKey"] == "anon-key"
+        assert str(client._base_url) == "https://project.supabase.co/storage/v1/"
+
+
+class TestStorageRepositoryUpsert:
+    """Tests for latest.json overwrite handling."""
+
+    async def test_latest_json_uses_upsert_without_delete(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that latest.json gets an upsert token and no pre-delete."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.create_signed_upload_url.return_value = {"token": "t"}
+
+        await repo.create_signed_upload_url("user-123/latest.json")
+
+        path, options = mock_bucket.create_signed_upload_url.call_args[0]
+        assert path == "user-123/latest.json"
+        assert options.upsert == "true"
+        mock_bucket.remove.assert_not_called()
+
+    async def test_backup_file_does_not_use_upsert(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that new backup files are signed without upsert."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.create_signed_upload_url.return_value = {"token": "t"}
+
+        await repo.create_signed_upload_url("user-123/backup.db.enc")
+
+        mock_bucket.create_signed_upload_url.assert_called_once_with(
+            "user-123/backup.db.enc"
+        )
+
+    async def test_upload_signing_skips_existence_probe(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that signing an upload is a single storage round-trip."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.create_signed_upload_url.return_value = {"token": "t"}
+
+        await repo.create_signed_upload_url("user-123/backup.db.enc")
+        await repo.create_signed_upload_url("user-123/latest.json")
+
+        assert mock_bucket.method_calls == [
+            call.create_signed_upload_url("user-123/backup.db.enc"),
+            call.create_signed_upload_url("user-123/latest.json", ANY),
+        ]
+
+
+class TestStorageRepositoryObjectExists:
+    """Tests for object_exists method."""
+
+    @pytest.mark.parametrize("exists", [True, False])
+    async def test_object_exists_uses_head_check(
+        self, storage_repo: StorageRepo, exists: bool
+    ) -> None:
+        """Test that existence comes from the bucket's HEAD-based check."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.exists.return_value = exists
+
+        result = await repo.object_exists("user-123/latest.json")
+
+        assert result is exists
+        mock_bucket.exists.assert_called_once_with("user-123/latest.json")
+        mock_bucket.list.assert_not_called()
+        mock_bucket.create_signed_url.assert_not_called()
+
+    async def test_object_exists_raises_storage_error(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that unexpected storage failures raise StorageError."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.exists.side_effect = StorageApiError(
+            "Internal failure", "InternalError", 500
+        )
+
+        with pytest.raises(StorageError, match="Error checking existence"):
+            await repo.object_exists("user-123/latest.json")
+
+
+class TestStorageRepositorySignedUrlCache:
+    """Tests for signed download URL caching."""
+
+    @pytest.fixture
+    def mock_bucket(self, storage_repo: StorageRepo) -> AsyncMock:
+        """Serve the service client's bucket with one that signs URLs."""
+        _, mock_bucket, _ = storage_repo
+        mock_bucket.create_signed_url.return_value = {"signedURL": "https://x"}
+        return mock_bucket
+
+    async def test_repeat_request_served_from_cache(
+        self, mock_bucket: AsyncMock
+    ) -> None:
+        """Test that a repeated request reuses the signed URL."""
+        repo = StorageRepository(bucket_name="test-bucket")
+        first = await repo.create_signed_download_url("user-123/latest.json", 900)
+        second = await repo.create_signed_download_url("user-123/latest.json", 900)
+
+        assert first == second
+        mock_bucket.create_signed_url.assert_called_once()
+
+    async def test_cache_is_per_token(
+        self, mock_bucket: AsyncMock, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that URLs signed for one caller are not served to another."""
+        mock_client = Mock(from_=Mock(return_value=mock_bucket))
+        monkeypatch.setattr(
+            StorageRepository, "_get_client", AsyncMock(return_value=mock_client)
+        )
+
+        repo = StorageRepository(bucket_name="test-bucket")
+        await repo.create_signed_download_url("user-123/a", 900, "token-a")
+        await repo.create_signed_download_url("user-123/a", 900, "token-b")
+
+        assert mock_bucket.create_signed_url.call_count == 2
+        assert all(b"token" not in key[3] for key in repository._signed_urls)
+
+    async def test_cache_expires_after_half_validity(
+        self, mock_bucket: AsyncMock, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that cached URLs are dropped after half their validity."""
+        repo = StorageRepository(bucket_name="test-bucket")
+        monkeypatch.setattr(repository.time, "time", lambda: 1000.0)
+        await repo.create_signed_download_url("user-123/latest.json", 900)
+        monkeypatch.setattr(repository.time, "time", lambda: 1451.0)
+        await repo.create_signed_download_url("user-123/latest.json", 900)
+
+        assert mock_bucket.create_signed_url.call_count == 2
+
+    async def test_short_lived_urls_not_cached(self, mock_bucket: AsyncMock) -> None:
+        """Test that URLs valid for under twice the minimum TTL are not cached."""
+        repo = StorageRepository(bucket_name="test-bucket")
+        await repo.create_signed_download_url("user-123/latest.json", 10)
+        await repo.create_signed_download_url("user-123/latest.json", 10)
+
+        assert mock_bucket.create_signed_url.call_count == 2
+
+
+class TestStorageRepositoryErrors:
+    """Tests for typed storage errors."""
+
+    async def test_download_missing_object_raises_not_found(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that a missing object raises StorageNotFoundError."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.create_signed_url.side_effect = StorageApiError(
+            "Object not found", "not_found", 404
+        )
+
+        with pytest.raises(StorageNotFoundError) as exc_info:
+            await repo.create_signed_download_url("user-123/missing.db.enc", 60)
+
+        assert exc_info.value.path == "user-123/missing.db.enc"
+
+    async def test_delete_missing_object_is_not_a_bucket_error(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that an object-not-found error is not reported as a missing bucket."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.remove.side_effect = StorageApiError(
+            "Object not found", "not_found", 404
+        )
+
+        with pytest.raises(StorageError, match="Error deleting files") as exc_info:
+            await repo.delete_files(["user-123/missing.db.enc"])
+
+        assert not isinstance(exc_info.value, StorageBucketMissingError)
+
+    async def test_list_rls_rejection_raises_rls_violation(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that an RLS rejection raises StorageRLSViolationError."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.list.side_effect = StorageException(
+            {"message": "new row violates row-level security policy"}
+        )
+
+        with pytest.raises(StorageRLSViolationError):
+            await repo.list_user_files("user-123")
+
+
+class TestErrorFields:
+    """Tests for unpacking storage error fields."""
+
+    def test_storage_api_error(self) -> None:
+        """Test that storage3 API errors are read from their attributes."""
+        error = StorageApiError("Object not found", "not_found", 404)
+        assert repository._error_fields(error) == ("not_found", "Object not found")
+
+    def test_exception_with_dict_payload(self) -> None:
+        """Test that dict payloads carried in exception args are unpacked."""
+        error = StorageException({"code": "NoSuchKey", "message": "Missing"})
+        assert repository._error_fields(error) == ("NoSuchKey", "Missing")
+
+    async def test_list_treats_api_not_found_as_empty(
+        self, storage_repo: StorageRepo
+    ) -> None:
+        """Test that a storage3 not-found error lists as an empty folder."""
+        repo, mock_bucket, _ = storage_repo
+        mock_bucket.list.side_effect = StorageApiError(
+            "Object not found", "not_found", 404
+        )
+
+        assert await repo.list_user_files("user-123") == []
+
+
+class TestClassifyStorageError:
+    """Tests for storage error classification."""
+
+    @pytest.mark.parametrize(
+        "error_code,error_message",
+        [
+            ("NoSuchKey", "Unknown error"),
+            ("not_found", "Unknown error"),
+            ("Unknown", "Object not found"),
+            ("Unknown", "The resource Does Not Exist"),
+        ],
+    )
+    def test_not_found_errors(self, error_code: str, error_message: str) -> None:
+        """Test that not-found codes and messages are recognised."""
+        assert repository._classify_storage_error(error_code, error_message) == (
+            "missing"
+        )
+
+    @pytest.mark.parametrize(
+        "error_message",
+        [
+            "new row violates row-level security policy",
+            "New row violates Row-Level Security Policy",
+            "RLS check failed",
+        ],
+    )
+    def test_rls_errors(self, error_message: str) -> None:
+        """Test that row-level security rejections are recognised."""
+        assert repository._classify_storage_error("Unknown", error_message) == "rls"
+
+    @pytest.mark.parametrize("error_code", ["NoSuchBucket", "InvalidRequest"])
+    def test_bucket_errors(self, error_code: str) -> None:
+        """Test that bucket codes take precedence over not-found messages."""
+        assert repository._classify_storage_error(error_code, "Bucket not found") == (
+            "bucket"
+        )
+
+    def test_other_errors(self) -> None:
+        """Test that unrelated errors are not treated as not found."""
+        assert (
+            repository._classify_storage_error(
+                "Duplicate", "The resource already exists"
+            )
+            == "other"
+        )
 
+    def test_urls_are_not_rls(self) -> None:
+        """Test that lowercase "rls" inside words does not match."""
+        assert repository._classify_storage_error("Unknown", "Invalid urls") == "other"
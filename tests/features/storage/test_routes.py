@@ -1,77 +1,118 @@
 """Tests for storage routes."""
 
+from typing import Any, Callable, Coroutine, Iterator
+
 import pytest
-from unittest.mock import Mock, patch, AsyncMock
-from fastapi.testclient import TestClient
+from unittest.mock import Mock
 from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from fastapi.responses import ORJSONResponse
+
+from app.features.storage.routes import (
+    _storage_repository,
+    get_storage_service,
+    presign_download,
+    presign_upload,
+    router,
+)
+from app.features.storage.schemas import (
+    PresignDownloadReq,
+    PresignDownloadRes,
+    PresignUploadReq,
+    PresignUploadRes,
+)
+
+# Keep the module on one worker under pytest-xdist --dist loadgroup
+pytestmark = pytest.mark.xdist_group(name="storage-routes")
+
+_USER = "123e4567-e89b-12d3-a456-426614174000"
+
+# Responses are immutable, so every test shares one unvalidated instance
+_CANNED_UPLOAD_RES = PresignUploadRes.model_construct(
+    path=f"backups/{_USER}/2025-12-06T11-20-45-a1b2c3.db.enc",
+    token="token1",
+    latest_path=f"backups/{_USER}/latest.json",
+    latest_token="token2",
+)
+_CANNED_DOWNLOAD_RES = PresignDownloadRes.model_construct(
+    url="https://signed-url.example.com"
+)
+
+
+def _async_return(value: Any) -> Callable[..., Coroutine[Any, Any, Any]]:
+    """Build a coroutine function that returns value."""
+
+    async def _return(*args: Any, **kwargs: Any) -> Any:
+        return value
 
-from app.features.storage.routes import router
-from app.features.storage.schemas import PresignUploadRes, PresignDownloadRes
+    return _return
 
 
-# Create test app
-app = FastAPI()
-app.include_router(router)
+def _async_raise(exc: Exception) -> Callable[..., Coroutine[Any, Any, Any]]:
+    """Build a coroutine function that raises exc."""
+
+    async def _raise(*args: Any, **kwargs: Any) -> Any:
+        raise exc
+
+    return _raise
+
+
+@pytest.fixture
+def mock_service(app: FastAPI) -> Iterator[Mock]:
+    """Serve the routes with a mocked storage service."""
+    mock_service = Mock()
+    app.dependency_overrides[get_storage_service] = lambda: mock_service
+    yield mock_service
+    app.dependency_overrides.pop(get_storage_service, None)
 
 
 class TestPresignUploadRoute:
-    """Test POST /v1/storage/presign-upload route."""
+    """Test POST /api/v1/storage/presign-upload route."""
 
-    @patch("app.features.storage.routes._storage_service")
-    def test_presign_upload_success(self, mock_service: Mock) -> None:
+    async def test_presign_upload_success(self) -> None:
         """Test successful presign upload request."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
-        mock_response = PresignUploadRes(
-            path=f"backups/{user_id}/2025-12-06T11-20-45-a1b2c3.db.enc",
-            token="token1",
-            latest_path=f"backups/{user_id}/latest.json",
-            latest_token="token2",
+        mock_service = Mock(
+            presign_upload=Mock(side_effect=_async_return(_CANNED_UPLOAD_RES))
         )
 
-        mock_service.presign_upload = AsyncMock(return_value=mock_response)
+        result = await presign_upload(
+            PresignUploadReq(filename="wallyo.db.enc"),
+            user_id=_USER,
+            user_token="valid-token",
+            service=mock_service,
+        )
 
-        client = TestClient(app)
-        response = client.post(
-            "/v1/storage/presign-upload",
-            json={"filename": "wallyo.db.enc"},
-            headers={"Authorization": "Bearer valid-token"},
+        assert result is _CANNED_UPLOAD_RES
+        assert result.path.endswith(".db.enc")
+        assert result.latest_path.endswith("latest.json")
+        mock_service.presign_upload.assert_called_once_with(
+            _USER, "wallyo.db.enc", "valid-token"
         )
 
-        assert response.status_code == 200
-        data = response.json()
-        assert "path" in data
-        assert "token" in data
-        assert "latest_path" in data
-        assert "latest_token" in data
-        assert data["path"].endswith(".db.enc")
-        assert data["latest_path"].endswith("latest.json")
-
-    @patch("app.features.storage.routes.get_user_id")
-    def test_presign_upload_missing_auth(self, mock_get_user_id: Mock) -> None:
+    def test_presign_upload_missing_auth(
+        self, mock_service: Mock, client: TestClient
+    ) -> None:
         """Test that missing authorization header returns 401."""
-        mock_get_user_id.side_effect = Exception("Unauthorized")
-
-        client = TestClient(app)
         response = client.post(
-            "/v1/storage/presign-upload",
+            "/api/v1/storage/presign-upload",
             json={"filename": "wallyo.db.enc"},
         )
 
         assert response.status_code in [401, 422]  # 422 if FastAPI validation fails first
+        mock_service.presign_upload.assert_not_called()
 
-    @patch("app.features.storage.routes._storage_service")
-    def test_presign_upload_invalid_filename(self, mock_service: Mock) -> None:
+    def test_presign_upload_invalid_filename(
+        self, mock_service: Mock, client: TestClient, authenticated: str
+    ) -> None:
         """Test that filename with slashes returns 400."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
         from fastapi import HTTPException
 
-        mock_service.presign_upload = AsyncMock(
-            side_effect=HTTPException(status_code=400, detail="Filename cannot contain slashes")
+        mock_service.presign_upload = _async_raise(
+            HTTPException(status_code=400, detail="Filename cannot contain slashes")
         )
 
-        client = TestClient(app)
         response = client.post(
-            "/v1/storage/presign-upload",
+            "/api/v1/storage/presign-upload",
             json={"filename": "path/to/file.db.enc"},
             headers={"Authorization": "Bearer valid-token"},
         )
@@ -80,49 +121,38 @@ class TestPresignUploadRoute:
 
 
 class TestPresignDownloadRoute:
-    """Test POST /v1/storage/presign-download route."""
+    """Test POST /api/v1/storage/presign-download route."""
 
-    @patch("app.features.storage.routes._storage_service")
-    def test_presign_download_success(self, mock_service: Mock) -> None:
+    async def test_presign_download_success(self) -> None:
         """Test successful presign download request."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
-        mock_response = PresignDownloadRes(
-            url="https://signed-url.example.com"
+        mock_service = Mock(
+            presign_download=Mock(side_effect=_async_return(_CANNED_DOWNLOAD_RES))
         )
 
-        mock_service.presign_download = AsyncMock(return_value=mock_response)
-
-        client = TestClient(app)
-        response = client.post(
-            "/v1/storage/presign-download",
-            json={
-                "path": f"backups/{user_id}/latest.json",
-                "seconds": 900,
-            },
-            headers={"Authorization": "Bearer valid-token"},
+        result = await presign_download(
+            PresignDownloadReq(path=f"backups/{_USER}/latest.json", seconds=900),
+            user_id=_USER,
+            user_token="valid-token",
+            service=mock_service,
         )
 
-        assert response.status_code == 200
-        data = response.json()
-        assert "url" in data
-        assert data["url"] == "https://signed-url.example.com"
+        assert result.url == "https://signed-url.example.com"
+        mock_service.presign_download.assert_called_once_with(
+            _USER, f"backups/{_USER}/latest.json", 900, "valid-token"
+        )
 
-    @patch("app.features.storage.routes._storage_service")
     def test_presign_download_with_default_seconds(
-        self, mock_service: Mock
+        self, mock_service: Mock, client: TestClient, authenticated: str
     ) -> None:
         """Test that seconds defaults to 900 if not provided."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
-        mock_response = PresignDownloadRes(
-            url="https://signed-url.example.com"
+        # Wrapped in a Mock so the call arguments are recorded
+        mock_service.presign_download = Mock(
+            side_effect=_async_return(_CANNED_DOWNLOAD_RES)
         )
 
-        mock_service.presign_download = AsyncMock(return_value=mock_response)
-
-        client = TestClient(app)
         response = client.post(
-            "/v1/storage/presign-download",
-            json={"path": f"backups/{user_id}/latest.json"},
+            "/api/v1/storage/presign-download",
+            json={"path": f"backups/{_USER}/latest.json"},
             headers={"Authorization": "Bearer valid-token"},
         )
 
@@ -132,21 +162,20 @@ class TestPresignDownloadRoute:
         call_args = mock_service.presign_download.call_args
         assert call_args[0][2] == 900  # seconds parameter
 
-    @patch("app.features.storage.routes._storage_service")
-    def test_presign_download_invalid_path(self, mock_service: Mock) -> None:
+    def test_presign_download_invalid_path(
+        self, mock_service: Mock, client: TestClient, authenticated: str
+    ) -> None:
         """Test that path for different user returns 403."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
         from fastapi import HTTPException
 
-        mock_service.presign_download = AsyncMock(
-            side_effect=HTTPException(
+        mock_service.presign_download = _async_raise(
+            HTTPException(
                 status_code=403, detail="Path must start with backups/{user_id}/"
             )
         )
 
-        client = TestClient(app)
         response = client.post(
-            "/v1/storage/presign-download",
+            "/api/v1/storage/presign-download",
             json={
                 "path": "backups/other-user-id/latest.json",
                 "seconds": 900,
@@ -156,18 +185,31 @@ class TestPresignDownloadRoute:
 
         assert response.status_code == 403
 
-    @patch("app.features.storage.routes.get_user_id")
     def test_presign_download_missing_auth(
-        self, mock_get_user_id: Mock
+        self, mock_service: Mock, client: TestClient
     ) -> None:
         """Test that missing authorization header returns 401."""
-        mock_get_user_id.side_effect = Exception("Unauthorized")
-
-        client = TestClient(app)
         response = client.post(
-            "/v1/storage/presign-download",
+            "/api/v1/storage/presign-download",
             json={"path": "backups/user-id/latest.json"},
         )
 
         assert response.status_code in [401, 422]
+        mock_service.presign_download.assert_not_called()
+
+
+
+class TestStorageDependencies:
+    """Test storage dependency providers."""
+
+    def test_service_is_shared_across_requests(self) -> None:
+        """Test that every request resolves the same service instance."""
+        assert get_storage_service() is get_storage_service()
+
+    def test_service_wraps_shared_repository(self) -> None:
+        """Test that the service is built on the shared repository."""
+        assert get_storage_service().repository is _storage_repository
 
+    def test_routes_respond_with_orjson(self) -> None:
+        """Test that storage routes serialize responses with orjson."""
+        assert router.default_response_class is ORJSONResponse
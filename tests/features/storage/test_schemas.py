@@ -1,5 +1,7 @@
 """Tests for storage schemas."""
 
+from typing import Any, Dict
+
 import pytest
 from pydantic import ValidationError
 
@@ -10,6 +12,9 @@ from app.features.storage.schemas import (
     PresignDownloadRes,
 )
 
+# Keep the module on one worker under pytest-xdist --dist loadgroup
+pytestmark = pytest.mark.xdist_group(name="storage-schemas")
+
 
 class TestPresignUploadReq:
     """Test PresignUploadReq schema."""
@@ -29,8 +34,8 @@ class TestPresignUploadRes:
     """Test PresignUploadRes schema."""
 
     def test_valid_upload_response(self) -> None:
-        """Test that valid response fields are accepted."""
-        res = PresignUploadRes(
+        """Test that response fields are assigned."""
+        res = PresignUploadRes.model_construct(
             path="backups/user-id/file.db.enc",
             token="token123",
             latest_path="backups/user-id/latest.json",
@@ -46,15 +51,24 @@ class TestPresignUploadRes:
         with pytest.raises(ValidationError):
             PresignUploadRes(path="backups/user-id/file.db.enc")
 
+    def test_response_is_immutable(self) -> None:
+        """Test that response fields cannot be reassigned."""
+        res = PresignUploadRes(
+            path="user-id/file.db.enc",
+            token="token123",
+            latest_path="user-id/latest.json",
+            latest_token="token456",
+        )
+        with pytest.raises(ValidationError):
+            res.token = "other"
+
 
 class TestPresignDownloadReq:
     """Test PresignDownloadReq schema."""
 
     def test_valid_download_request(self) -> None:
         """Test that valid path and seconds are accepted."""
-        req = PresignDownloadReq(
-            path="backups/user-id/latest.json", seconds=300
-        )
+        req = PresignDownloadReq(path="backups/user-id/latest.json", seconds=300)
         assert req.path == "backups/user-id/latest.json"
         assert req.seconds == 300
 
@@ -63,34 +77,32 @@ class TestPresignDownloadReq:
         req = PresignDownloadReq(path="backups/user-id/latest.json")
         assert req.seconds == 900
 
-    def test_seconds_below_minimum_raises_error(self) -> None:
-        """Test that seconds < 1 raises ValidationError."""
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"path": "backups/user-id/latest.json", "seconds": 0},
+            {"path": "backups/user-id/latest.json", "seconds": 4000},
+            {},
+        ],
+        ids=["seconds-below-minimum", "seconds-above-maximum", "missing-path"],
+    )
+    def test_invalid_download_request_raises_error(
+        self, kwargs: Dict[str, Any]
+    ) -> None:
+        """Test that out-of-range seconds or a missing path raise ValidationError."""
         with pytest.raises(ValidationError):
-            PresignDownloadReq(path="backups/user-id/latest.json", seconds=0)
-
-    def test_seconds_above_maximum_raises_error(self) -> None:
-        """Test that seconds > 3600 raises ValidationError."""
-        with pytest.raises(ValidationError):
-            PresignDownloadReq(
-                path="backups/user-id/latest.json", seconds=4000
-            )
-
-    def test_missing_path_raises_error(self) -> None:
-        """Test that missing path raises ValidationError."""
-        with pytest.raises(ValidationError):
-            PresignDownloadReq()
+            PresignDownloadReq(**kwargs)
 
 
 class TestPresignDownloadRes:
     """Test PresignDownloadRes schema."""
 
     def test_valid_download_response(self) -> None:
-        """Test that valid URL is accepted."""
-        res = PresignDownloadRes(url="https://signed-url.example.com")
+        """Test that the URL field is assigned."""
+        res = PresignDownloadRes.model_construct(url="https://signed-url.example.com")
         assert res.url == "https://signed-url.example.com"
 
     def test_missing_url_raises_error(self) -> None:
         """Test that missing URL raises ValidationError."""
         with pytest.raises(ValidationError):
             PresignDownloadRes()
-
@@ -1,69 +1,130 @@
 """Tests for storage service."""
 
+import asyncio
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
 import pytest
-from unittest.mock import Mock, patch, AsyncMock
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+from unittest.mock import Mock, AsyncMock
 from fastapi import HTTPException
 
-from app.features.storage.service import StorageService, MAX_BACKUPS, KEEP_BACKUPS
+from app.features.storage import service as service_module
+from app.features.storage.exceptions.storage_not_found_error import (
+    StorageNotFoundError,
+)
+from app.features.storage.service import (
+    BACKUP_COUNT_CACHE_TTL,
+    CLEANUP_LIST_LIMIT,
+    KEEP_BACKUPS,
+    MAX_BACKUPS,
+    StorageService,
+)
+from app.features.storage.presigner import LocalPresigner
 from app.features.storage.repository import StorageRepository
 from app.features.storage.schemas import PresignUploadRes, PresignDownloadRes
+from tests.features.storage.fakes import FakeStorageRepository
 
+# Property tests use a fixed seed so CI failures reproduce; they read only the
+# module-scoped service, so the per-test fixtures are safe to share across
+# examples
+PROPERTY_SETTINGS = settings(
+    derandomize=True,
+    suppress_health_check=[HealthCheck.function_scoped_fixture],
+)
 
-class TestStorageService:
-    """Test StorageService class."""
 
-    @pytest.fixture
-    def mock_repository(self) -> Mock:
-        """Create a mock repository."""
-        return Mock(spec=StorageRepository)
+@pytest.fixture(autouse=True)
+async def drain_background_tasks() -> AsyncIterator[None]:
+    """Let cleanup tasks scheduled by a test finish on its own event loop."""
+    yield
+    await asyncio.gather(*service_module._background_tasks, return_exceptions=True)
 
-    @pytest.fixture
-    def service(self, mock_repository: Mock) -> StorageService:
-        """Create a service instance with mock repository."""
-        return StorageService(mock_repository)
 
-    def test_build_backup_paths_with_db_enc(self, service: StorageService) -> None:
-        """Test path building for .db.enc files."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
-        data_path, latest_path = service.build_backup_paths(user_id, "wallyo.db.enc")
+@pytest.fixture(scope="module")
+def shared_repository() -> Mock:
+    """Create the mock repository once per module."""
+    return Mock(spec=StorageRepository)
 
-        assert data_path.startswith(f"backups/{user_id}/")
-        assert data_path.endswith(".db.enc")
-        assert "-" in data_path  # Should contain timestamp and random hex
-        assert latest_path == f"backups/{user_id}/latest.json"
 
-    def test_build_backup_paths_with_other_extension(
-        self, service: StorageService
-    ) -> None:
-        """Test path building for other file types."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
-        data_path, latest_path = service.build_backup_paths(user_id, "backup.tar.gz")
+@pytest.fixture(scope="module")
+def shared_service(shared_repository: Mock) -> StorageService:
+    """Create the service once per module."""
+    return StorageService(shared_repository)
 
-        assert data_path.startswith(f"backups/{user_id}/")
-        assert "backup.tar.gz" in data_path
-        assert latest_path == f"backups/{user_id}/latest.json"
 
-    def test_build_backup_paths_sanitizes_slashes(
-        self, service: StorageService
+@pytest.fixture
+def mock_repository(shared_repository: Mock) -> Mock:
+    """Provide the shared mock repository with calls and responses reset."""
+    shared_repository.reset_mock(return_value=True, side_effect=True)
+    return shared_repository
+
+
+@pytest.fixture
+def service(shared_service: StorageService, mock_repository: Mock) -> StorageService:
+    """Provide the shared service with no cached backup counts."""
+    shared_service._backup_counts.clear()
+    return shared_service
+
+
+@pytest.fixture
+def fake_repository() -> FakeStorageRepository:
+    """Create a fake repository for tests that only need canned results."""
+    return FakeStorageRepository()
+
+
+@pytest.fixture
+def fake_service(fake_repository: FakeStorageRepository) -> StorageService:
+    """Create a service on the fake repository."""
+    return StorageService(fake_repository)  # type: ignore[arg-type]
+
+
+class TestStorageService:
+    """Test StorageService class."""
+
+    @given(
+        user_id=st.uuids().map(str),
+        filename=st.text(min_size=1, max_size=64).filter(lambda s: "\x00" not in s),
+    )
+    @PROPERTY_SETTINGS
+    def test_build_backup_paths_properties(
+        self, shared_service: StorageService, user_id: str, filename: str
     ) -> None:
-        """Test that slashes in filename are replaced."""
-        user_id = "123e4567-e89b-12d3-a456-426614174000"
-        data_path, _ = service.build_backup_paths(user_id, "path/to/file.db.enc")
+        """Test that any filename yields one object directly in the user's folder."""
+        data_path, latest_path = shared_service.build_backup_paths(user_id, filename)
+
+        prefix = f"{user_id}/"
+        assert data_path.startswith(prefix)
+        assert "/" not in data_path[len(prefix) :]
+        assert latest_path == f"{user_id}/latest.json"
+        safe_filename = filename.replace("/", "_")
+        if safe_filename.endswith(".db.enc"):
+            assert data_path.endswith(".db.enc")
+        else:
+            assert data_path.endswith(f"-{safe_filename}")
+
+    def test_build_backup_paths_compact_timestamp(
+        self, service: StorageService, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that data paths use a second-resolution UTC timestamp."""
+        now = datetime(2025, 1, 26, 12, 30, 45, tzinfo=timezone.utc)
+        monkeypatch.setattr(service_module.time, "gmtime", lambda: now.timetuple())
+
+        data_path, _ = service.build_backup_paths("user-123", "wallyo.db.enc")
 
-        assert "/" not in data_path.split(f"backups/{user_id}/")[1]
-        assert "_" in data_path  # Slashes should be replaced
+        assert re.fullmatch(r"user-123/20250126T123045-[0-9a-f]{4}\.db\.enc", data_path)
 
     def test_validate_download_path_valid(self, service: StorageService) -> None:
         """Test that valid path passes validation."""
         user_id = "123e4567-e89b-12d3-a456-426614174000"
-        path = f"backups/{user_id}/latest.json"
+        path = f"{user_id}/latest.json"
 
         # Should not raise
         service.validate_download_path(path, user_id)
 
-    def test_validate_download_path_invalid_user(
-        self, service: StorageService
-    ) -> None:
+    def test_validate_download_path_invalid_user(self, service: StorageService) -> None:
         """Test that path for different user raises 403."""
         user_id = "123e4567-e89b-12d3-a456-426614174000"
         other_user_id = "987fcdeb-51a2-43d7-b890-123456789abc"
@@ -74,6 +135,35 @@ class TestStorageService:
 
         assert exc_info.value.status_code == 403
 
+    @pytest.mark.parametrize("path", ["user-12/latest.json", "user-1", "user-1-x/a"])
+    def test_validate_download_path_requires_separator(
+        self, service: StorageService, path: str
+    ) -> None:
+        """Test that paths only sharing the user ID as a prefix are rejected."""
+        with pytest.raises(HTTPException) as exc_info:
+            service.validate_download_path(path, "user-1")
+
+        assert exc_info.value.status_code == 403
+        assert exc_info.value.detail == "Path must start with user-1/"
+
+    @pytest.mark.parametrize(
+        "path", ["user-1/../user-2/latest.json", "user-1/a/../../user-2/x", "user-1/.."]
+    )
+    def test_validate_download_path_rejects_parent_segments(
+        self, service: StorageService, path: str
+    ) -> None:
+        """Test that ".." segments cannot climb into another user's folder."""
+        with pytest.raises(HTTPException) as exc_info:
+            service.validate_download_path(path, "user-1")
+
+        assert exc_info.value.status_code == 403
+
+    def test_validate_download_path_allows_dots_in_names(
+        self, service: StorageService
+    ) -> None:
+        """Test that names merely containing dots are not mistaken for ".."."""
+        service.validate_download_path("user-1/..hidden..db.enc", "user-1")
+
     def test_validate_download_path_outside_backups(
         self, service: StorageService
     ) -> None:
@@ -86,29 +176,47 @@ class TestStorageService:
 
         assert exc_info.value.status_code == 403
 
-    @pytest.mark.asyncio
     async def test_presign_upload_success(
-        self, service: StorageService, mock_repository: Mock
+        self, fake_service: StorageService, fake_repository: FakeStorageRepository
     ) -> None:
         """Test successful presign upload."""
         user_id = "123e4567-e89b-12d3-a456-426614174000"
         filename = "wallyo.db.enc"
 
-        mock_repository.create_signed_upload_url.side_effect = [
-            {"data": {"token": "token1"}},
-            {"data": {"token": "token2"}},
-        ]
+        fake_repository.upload_urls.extend([{"token": "token1"}, {"token": "token2"}])
 
-        result = await service.presign_upload(user_id, filename)
+        result = await fake_service.presign_upload(user_id, filename)
 
         assert isinstance(result, PresignUploadRes)
-        assert result.path.startswith(f"backups/{user_id}/")
+        assert result.path.startswith(f"{user_id}/")
         assert result.token == "token1"
-        assert result.latest_path == f"backups/{user_id}/latest.json"
+        assert result.latest_path == f"{user_id}/latest.json"
         assert result.latest_token == "token2"
-        assert mock_repository.create_signed_upload_url.call_count == 2
+        uploads = [arg for method, arg in fake_repository.calls if method == "upload"]
+        assert uploads == [result.path, result.latest_path]
+
+    async def test_presign_upload_signs_urls_concurrently(
+        self, service: StorageService, mock_repository: Mock
+    ) -> None:
+        """Test that both upload URLs are requested before either completes."""
+        both_started = asyncio.Event()
+        started = []
+
+        async def sign(path: str, user_token: Optional[str] = None) -> dict:
+            started.append(path)
+            if len(started) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+            return {"token": f"token-{len(started)}"}
+
+        mock_repository.list_user_files.return_value = []
+        mock_repository.create_signed_upload_url.side_effect = sign
+
+        result = await service.presign_upload("user-123", "wallyo.db.enc")
+
+        assert len(started) == 2
+        assert result.latest_path == "user-123/latest.json"
 
-    @pytest.mark.asyncio
     async def test_presign_upload_with_slashes_in_filename(
         self, service: StorageService
     ) -> None:
@@ -121,7 +229,6 @@ class TestStorageService:
         assert exc_info.value.status_code == 400
         assert "slashes" in exc_info.value.detail.lower()
 
-    @pytest.mark.asyncio
     async def test_presign_upload_repository_error(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
@@ -137,16 +244,15 @@ class TestStorageService:
         assert exc_info.value.status_code == 500
         assert "Failed to create upload tokens" in exc_info.value.detail
 
-    @pytest.mark.asyncio
     async def test_presign_download_success(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
         """Test successful presign download."""
         user_id = "123e4567-e89b-12d3-a456-426614174000"
-        path = f"backups/{user_id}/latest.json"
+        path = f"{user_id}/latest.json"
 
         mock_repository.create_signed_download_url.return_value = {
-            "data": {"signedUrl": "https://signed-url.example.com"}
+            "signedURL": "https://signed-url.example.com"
         }
 
         result = await service.presign_download(user_id, path, 900)
@@ -154,13 +260,10 @@ class TestStorageService:
         assert isinstance(result, PresignDownloadRes)
         assert result.url == "https://signed-url.example.com"
         mock_repository.create_signed_download_url.assert_called_once_with(
-            path, 900
+            path, 900, None
         )
 
-    @pytest.mark.asyncio
-    async def test_presign_download_invalid_path(
-        self, service: StorageService
-    ) -> None:
+    async def test_presign_download_invalid_path(self, service: StorageService) -> None:
         """Test that invalid path raises 403."""
         user_id = "123e4567-e89b-12d3-a456-426614174000"
         path = "backups/other-user-id/latest.json"
@@ -170,13 +273,12 @@ class TestStorageService:
 
         assert exc_info.value.status_code == 403
 
-    @pytest.mark.asyncio
     async def test_presign_download_repository_error(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
         """Test that repository errors are handled."""
         user_id = "123e4567-e89b-12d3-a456-426614174000"
-        path = f"backups/{user_id}/latest.json"
+        path = f"{user_id}/latest.json"
 
         mock_repository.create_signed_download_url.side_effect = Exception(
             "Supabase error"
@@ -188,53 +290,134 @@ class TestStorageService:
         assert exc_info.value.status_code == 500
         assert "Failed to create download URL" in exc_info.value.detail
 
+    async def test_presign_download_missing_object_returns_404(
+        self, service: StorageService, mock_repository: Mock
+    ) -> None:
+        """Test that a missing object is reported as 404."""
+        user_id = "123e4567-e89b-12d3-a456-426614174000"
+        path = f"{user_id}/latest.json"
 
-class TestBackupCleanup:
-    """Tests for backup cleanup functionality."""
+        mock_repository.create_signed_download_url.side_effect = StorageNotFoundError(
+            path
+        )
 
-    @pytest.fixture
-    def mock_repository(self) -> Mock:
-        """Create a mock repository."""
-        return Mock(spec=StorageRepository)
+        with pytest.raises(HTTPException) as exc_info:
+            await service.presign_download(user_id, path, 900)
 
-    @pytest.fixture
-    def service(self, mock_repository: Mock) -> StorageService:
-        """Create a service instance with mock repository."""
-        return StorageService(mock_repository)
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.parametrize(
+        "result, expected",
+        [
+            ({"token": "abc"}, "abc"),
+            ({"signed_url": "https://x/upload/sign/b/p?token=abc"}, "abc"),
+            ({"signedURL": "https://x/upload/sign/b/p?a=1&token=a%2Eb&c=2"}, "a.b"),
+            ({"signed_url": "https://x/upload/sign/b/p?mytoken=abc"}, None),
+            ({}, None),
+            (None, None),
+        ],
+    )
+    def test_extract_upload_token(
+        self, result: Optional[dict], expected: Optional[str]
+    ) -> None:
+        """Test that the token is read from the result or its signed URL."""
+        assert StorageService._extract_upload_token(result) == expected
 
-    def test_sort_backups_by_timestamp_correct_order(
-        self, service: StorageService
+    async def test_presign_upload_signs_locally_with_presigner(
+        self, mock_repository: Mock
     ) -> None:
-        """Test that backups are sorted by timestamp (oldest first)."""
-        files = [
-            {"name": "2025-01-26T12-30-45.123456+00-00-a1b2c3d4.db.enc"},
-            {"name": "2025-01-25T10-00-00.000000+00-00-deadbeef.db.enc"},
-            {"name": "2025-01-27T08-15-30.999999+00-00-12345678.db.enc"},
-        ]
+        """Test that a presigner replaces the Supabase signing round-trips."""
+        presigner = LocalPresigner("test-jwt-secret", "https://proj.supabase.co", "b")
+        service = StorageService(mock_repository, presigner)
+        mock_repository.list_user_files.return_value = []
 
-        sorted_files = service._sort_backups_by_timestamp(files)
+        result = await service.presign_upload("user-123", "wallyo.db.enc")
 
-        assert sorted_files[0]["name"].startswith("2025-01-25")
-        assert sorted_files[1]["name"].startswith("2025-01-26")
-        assert sorted_files[2]["name"].startswith("2025-01-27")
+        assert result.token and result.latest_token
+        mock_repository.create_signed_upload_url.assert_not_called()
 
-    def test_sort_backups_by_timestamp_empty_list(
-        self, service: StorageService
+    async def test_presign_download_signs_locally_with_presigner(
+        self, mock_repository: Mock
     ) -> None:
-        """Test sorting empty list returns empty list."""
-        result = service._sort_backups_by_timestamp([])
-        assert result == []
+        """Test that download URLs are signed without calling the repository."""
+        presigner = LocalPresigner("test-jwt-secret", "https://proj.supabase.co", "b")
+        service = StorageService(mock_repository, presigner)
 
-    def test_sort_backups_by_timestamp_single_file(
-        self, service: StorageService
+        result = await service.presign_download("user-123", "user-123/latest.json", 900)
+
+        assert result.url.startswith(
+            "https://proj.supabase.co/storage/v1/object/sign/b/"
+        )
+        mock_repository.create_signed_download_url.assert_not_called()
+
+
+class TestBackupCleanup:
+    """Tests for backup cleanup functionality."""
+
+    @given(
+        timestamps=st.lists(
+            st.datetimes(
+                min_value=datetime(2000, 1, 1), max_value=datetime(2099, 1, 1)
+            ),
+            unique=True,
+            max_size=20,
+        ),
+        legacy=st.booleans(),
+        data=st.data(),
+    )
+    @PROPERTY_SETTINGS
+    async def test_cleanup_keeps_newest_backups_properties(
+        self,
+        timestamps: List[datetime],
+        legacy: bool,
+        data: st.DataObject,
+    ) -> None:
+        """Test that cleanup keeps the newest backups in either name format."""
+        if legacy:
+            fmt, hex_len = "%Y-%m-%dT%H-%M-%S.%f+00-00", 8
+        else:
+            # Compact names only have second resolution
+            timestamps = sorted({t.replace(microsecond=0) for t in timestamps})
+            fmt, hex_len = "%Y%m%dT%H%M%S", 4
+        names = [
+            f"{t.strftime(fmt)}-{'a' * hex_len}.db.enc" for t in sorted(timestamps)
+        ]
+        # A fresh repository and service per example, so no backup count is cached
+        repository = FakeStorageRepository()
+        repository.list_result = data.draw(
+            st.permutations([{"name": n} for n in names] + [{"name": "latest.json"}])
+        )
+        service = StorageService(repository)  # type: ignore[arg-type]
+
+        deleted = await service.cleanup_old_backups("user-123")
+
+        deletes = [arg for method, arg in repository.calls if method == "delete"]
+        if len(names) < MAX_BACKUPS:
+            assert deleted == 0
+            assert deletes == []
+        else:
+            expected = [f"user-123/{n}" for n in names[:-KEEP_BACKUPS]]
+            assert deleted == len(expected)
+            assert deletes == [expected]
+
+    async def test_cleanup_old_backups_mixed_formats(
+        self, fake_service: StorageService, fake_repository: FakeStorageRepository
     ) -> None:
-        """Test sorting single file returns same file."""
-        files = [{"name": "2025-01-26T12-00-00.000000+00-00-aabbccdd.db.enc"}]
-        result = service._sort_backups_by_timestamp(files)
-        assert len(result) == 1
-        assert result[0] == files[0]
+        """Test that legacy names are treated as older than compact ones."""
+        fake_repository.list_result = [
+            {"name": "20250128T090000-ab12.db.enc"},
+            {"name": "2025-01-27T08-15-30.999999+00-00-12345678.db.enc"},
+            {"name": "20250127T100000-ff00.db.enc"},
+        ]
+
+        deleted = await fake_service.cleanup_old_backups("user-123")
+
+        assert deleted == 1
+        assert fake_repository.calls[-1] == (
+            "delete",
+            ["user-123/2025-01-27T08-15-30.999999+00-00-12345678.db.enc"],
+        )
 
-    @pytest.mark.asyncio
     async def test_cleanup_old_backups_no_cleanup_needed(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
@@ -251,49 +434,94 @@ class TestBackupCleanup:
         assert deleted == 0
         mock_repository.delete_files.assert_not_called()
 
-    @pytest.mark.asyncio
-    async def test_cleanup_old_backups_deletes_oldest(
+    async def test_cleanup_old_backups_uses_cached_count(
         self, service: StorageService, mock_repository: Mock
+    ) -> None:
+        """Test that listings are skipped until uploads could reach MAX_BACKUPS."""
+        mock_repository.list_user_files.return_value = [
+            {"name": "2025-01-25T10-00-00.000000+00-00-aaaaaaaa.db.enc"},
+        ]
+
+        for _ in range(MAX_BACKUPS):
+            await service.cleanup_old_backups("user-123")
+
+        # One listing, one cached skip, then a listing once the count reaches
+        # MAX_BACKUPS
+        assert mock_repository.list_user_files.call_count == MAX_BACKUPS - 1
+
+    async def test_cleanup_uses_listing_cache_within_ttl(
+        self, service: StorageService, mock_repository: Mock
+    ) -> None:
+        """Test that back-to-back uploads list the user's folder once."""
+        mock_repository.list_user_files.return_value = []
+        mock_repository.create_signed_upload_url.return_value = {"token": "t"}
+
+        for _ in range(2):
+            await service.presign_upload("user-123", "wallyo.db.enc")
+            await asyncio.gather(*service_module._background_tasks)
+
+        assert mock_repository.list_user_files.call_count == 1
+
+    async def test_cleanup_old_backups_relists_after_ttl(
+        self,
+        service: StorageService,
+        mock_repository: Mock,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that cached counts expire and are refreshed from a listing."""
+        mock_repository.list_user_files.return_value = []
+
+        monkeypatch.setattr(service_module.time, "monotonic", lambda: 1000.0)
+        await service.cleanup_old_backups("user-123")
+        monkeypatch.setattr(
+            service_module.time,
+            "monotonic",
+            lambda: 1000.0 + BACKUP_COUNT_CACHE_TTL + 1,
+        )
+        await service.cleanup_old_backups("user-123")
+
+        assert mock_repository.list_user_files.call_count == 2
+
+    async def test_cleanup_old_backups_deletes_oldest(
+        self, fake_service: StorageService, fake_repository: FakeStorageRepository
     ) -> None:
         """Test that oldest backups are deleted when cleanup is triggered."""
         user_id = "user-123"
-        mock_repository.list_user_files.return_value = [
+        fake_repository.list_result = [
             {"name": "2025-01-23T10-00-00.000000+00-00-aaaaaaaa.db.enc"},
             {"name": "2025-01-24T10-00-00.000000+00-00-bbbbbbbb.db.enc"},
             {"name": "2025-01-25T10-00-00.000000+00-00-cccccccc.db.enc"},
             {"name": "2025-01-26T10-00-00.000000+00-00-dddddddd.db.enc"},
             {"name": "latest.json"},
         ]
-        mock_repository.delete_files.return_value = []
 
-        deleted = await service.cleanup_old_backups(user_id)
+        deleted = await fake_service.cleanup_old_backups(user_id)
 
         assert deleted == 2  # 4 backups - KEEP_BACKUPS(2) = 2 deleted
-        mock_repository.delete_files.assert_called_once()
-        deleted_paths = mock_repository.delete_files.call_args[0][0]
+        deletes = [arg for method, arg in fake_repository.calls if method == "delete"]
+        assert len(deletes) == 1
+        deleted_paths = deletes[0]
         assert len(deleted_paths) == 2
         assert "2025-01-23" in deleted_paths[0]
         assert "2025-01-24" in deleted_paths[1]
 
-    @pytest.mark.asyncio
     async def test_cleanup_old_backups_ignores_latest_json(
-        self, service: StorageService, mock_repository: Mock
+        self, fake_service: StorageService, fake_repository: FakeStorageRepository
     ) -> None:
         """Test that latest.json is not counted or deleted."""
         user_id = "user-123"
-        mock_repository.list_user_files.return_value = [
+        fake_repository.list_result = [
             {"name": "2025-01-25T10-00-00.000000+00-00-aaaaaaaa.db.enc"},
             {"name": "2025-01-26T10-00-00.000000+00-00-bbbbbbbb.db.enc"},
             {"name": "latest.json"},
             {"name": "some-other-file.txt"},
         ]
 
-        deleted = await service.cleanup_old_backups(user_id)
+        deleted = await fake_service.cleanup_old_backups(user_id)
 
         assert deleted == 0  # Only 2 .db.enc files
-        mock_repository.delete_files.assert_not_called()
+        assert fake_repository.calls == [("list", user_id)]
 
-    @pytest.mark.asyncio
     async def test_cleanup_old_backups_exactly_max_backups(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
@@ -312,7 +540,6 @@ class TestBackupCleanup:
         deleted_paths = mock_repository.delete_files.call_args[0][0]
         assert "2025-01-24" in deleted_paths[0]
 
-    @pytest.mark.asyncio
     async def test_cleanup_old_backups_error_does_not_raise(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
@@ -325,7 +552,6 @@ class TestBackupCleanup:
 
         assert deleted == 0
 
-    @pytest.mark.asyncio
     async def test_cleanup_old_backups_delete_error_does_not_raise(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
@@ -343,7 +569,6 @@ class TestBackupCleanup:
 
         assert deleted == 0
 
-    @pytest.mark.asyncio
     async def test_cleanup_old_backups_with_user_token(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
@@ -359,15 +584,36 @@ class TestBackupCleanup:
 
         await service.cleanup_old_backups(user_id, user_token)
 
-        mock_repository.list_user_files.assert_called_once_with(user_id, user_token)
+        mock_repository.list_user_files.assert_called_once_with(
+            user_id, user_token, limit=CLEANUP_LIST_LIMIT
+        )
         mock_repository.delete_files.assert_called_once()
         assert mock_repository.delete_files.call_args[0][1] == user_token
 
-    @pytest.mark.asyncio
+    async def test_cleanup_old_backups_relists_when_page_is_full(
+        self, service: StorageService, mock_repository: Mock
+    ) -> None:
+        """Test that a full newest-first page falls back to a complete listing."""
+        names = [f"202501{day:02d}T100000-aaaa.db.enc" for day in range(1, 11)]
+        everything = [{"name": name} for name in names]
+        mock_repository.list_user_files.side_effect = [
+            everything[::-1][:CLEANUP_LIST_LIMIT],
+            everything,
+        ]
+        mock_repository.delete_files.return_value = []
+
+        deleted = await service.cleanup_old_backups("user-123", "jwt-token")
+
+        assert deleted == len(names) - KEEP_BACKUPS
+        assert mock_repository.list_user_files.call_args_list[1].args == (
+            "user-123",
+            "jwt-token",
+        )
+
     async def test_presign_upload_calls_cleanup(
         self, service: StorageService, mock_repository: Mock
     ) -> None:
-        """Test that presign_upload calls cleanup before generating URLs."""
+        """Test that presign_upload schedules cleanup in the background."""
         user_id = "user-123"
         filename = "wallyo.db.enc"
 
@@ -381,11 +627,35 @@ class TestBackupCleanup:
         mock_repository.create_signed_upload_url.return_value = {"token": "test-token"}
 
         await service.presign_upload(user_id, filename)
+        await asyncio.gather(*service_module._background_tasks)
 
         # Verify cleanup was called
         mock_repository.list_user_files.assert_called_once()
         mock_repository.delete_files.assert_called_once()
 
+    async def test_presign_upload_does_not_wait_for_cleanup(
+        self, service: StorageService, mock_repository: Mock
+    ) -> None:
+        """Test that signed URLs are returned while cleanup is still running."""
+        release = asyncio.Event()
+
+        async def slow_list(
+            user_id: str, user_token: Optional[str] = None, limit: Optional[int] = None
+        ) -> list:
+            await release.wait()
+            return []
+
+        mock_repository.list_user_files.side_effect = slow_list
+        mock_repository.create_signed_upload_url.return_value = {"token": "test-token"}
+
+        result = await service.presign_upload("user-123", "wallyo.db.enc")
+
+        assert result.token == "test-token"
+        assert service_module._background_tasks
+        release.set()
+        await asyncio.gather(*service_module._background_tasks)
+        assert not service_module._background_tasks
+
     def test_max_backups_constant(self) -> None:
         """Test MAX_BACKUPS constant value."""
         assert MAX_BACKUPS == 3
@@ -393,4 +663,3 @@ class TestBackupCleanup:
     def test_keep_backups_constant(self) -> None:
         """Test KEEP_BACKUPS constant value."""
         assert KEEP_BACKUPS == 2
-